@@ -1,29 +1,49 @@
 # ---[ Imports
 from __future__ import division
 
-import scene as sc
+import heapq
 import numpy as np
-import sound
 import random
 
+# `sc` is Pythonista's scene module on iOS and the headless stand-in everywhere else
+import backend
+from backend import sc
+from audio import Mixer
+from entities import EntityStore, COIN, CLOUD, MONSTER
+from spatial import SpatialGrid
+from pool import NodePool
+from profiler import FrameProfiler
+from textures import textures
+from sprite_sync import SpriteSync
+from timers import TimerWheel
+import physics
+from level import LevelStream
+import snapshot
+import telemetry
+
 # ---[ Textures
-jumping_texture = sc.Texture('plf:AlienPink_jump')
-landing_texture = sc.Texture('plf:AlienPink_duck')
-dead_texture = sc.Texture('plf:AlienPink_hit')
+# Textures are referred to by name and loaded on first use through the shared texture cache (see textures.py)
+jumping_texture = 'plf:AlienPink_jump'
+landing_texture = 'plf:AlienPink_duck'
+dead_texture = 'plf:AlienPink_hit'
 
-Monster_textures = {'bee' : [sc.Texture('plf:Enemy_Bee'), sc.Texture('plf:Enemy_Bee_move'), sc.Texture('plf:Enemy_Bee_dead')], 'fly'	: [sc.Texture('plf:Enemy_Fly'), sc.Texture('plf:Enemy_Fly_move'), sc.Texture('plf:Enemy_Fly_dead')],
-'frog'  : [sc.Texture('plf:Enemy_Frog'), sc.Texture('plf:Enemy_Frog_move'), sc.Texture('plf:Enemy_Frog_dead')],
-'fish' 	: [sc.Texture('plf:Enemy_FishPink'), sc.Texture('plf:Enemy_FishPink_move'), sc.Texture('plf:Enemy_FishPink_dead')],
-'saw'	: [sc.Texture('plf:Enemy_Saw'), sc.Texture('plf:Enemy_Saw_move'), sc.Texture('plf:Enemy_Saw_dead')],
-'mouse' : [sc.Texture('plf:Enemy_Mouse'), sc.Texture('plf:Enemy_Mouse_move'), sc.Texture('plf:Enemy_Mouse_dead')],
-'bug'	: [sc.Texture('plf:Enemy_Ladybug'), sc.Texture('plf:Enemy_Ladybug_move'), sc.Texture('plf:Enemy_Ladybug_fly')],
-'blob'	: [sc.Texture('plf:Enemy_SlimePurple'), sc.Texture('plf:Enemy_SlimePurple_move'), sc.Texture('plf:Enemy_SlimePurple_dead')],
-'snail' : [sc.Texture('plf:Enemy_Snail'), sc.Texture('plf:Enemy_Snail_move'), sc.Texture('plf:Enemy_Snail_shell')],
-'worm'	: [sc.Texture('plf:Enemy_WormPink'), sc.Texture('plf:Enemy_WormPink_move'), sc.Texture('plf:Enemy_WormPink_dead')],
+Monster_textures = {'bee' : ['plf:Enemy_Bee', 'plf:Enemy_Bee_move', 'plf:Enemy_Bee_dead'], 'fly'	: ['plf:Enemy_Fly', 'plf:Enemy_Fly_move', 'plf:Enemy_Fly_dead'],
+'frog'  : ['plf:Enemy_Frog', 'plf:Enemy_Frog_move', 'plf:Enemy_Frog_dead'],
+'fish' 	: ['plf:Enemy_FishPink', 'plf:Enemy_FishPink_move', 'plf:Enemy_FishPink_dead'],
+'saw'	: ['plf:Enemy_Saw', 'plf:Enemy_Saw_move', 'plf:Enemy_Saw_dead'],
+'mouse' : ['plf:Enemy_Mouse', 'plf:Enemy_Mouse_move', 'plf:Enemy_Mouse_dead'],
+'bug'	: ['plf:Enemy_Ladybug', 'plf:Enemy_Ladybug_move', 'plf:Enemy_Ladybug_fly'],
+'blob'	: ['plf:Enemy_SlimePurple', 'plf:Enemy_SlimePurple_move', 'plf:Enemy_SlimePurple_dead'],
+'snail' : ['plf:Enemy_Snail', 'plf:Enemy_Snail_move', 'plf:Enemy_Snail_shell'],
+'worm'	: ['plf:Enemy_WormPink', 'plf:Enemy_WormPink_move', 'plf:Enemy_WormPink_dead'],
 }
 
 Monster_types = list(Monster_textures.keys())
 
+# The texture of a monster of type `enemy_type` for animation frame `frame` (0 and 1 are the walking frames, 2 is dead)
+def monster_texture(enemy_type, frame):
+	return textures.get(Monster_textures[enemy_type][frame])
+
 # ---[Definitions
 
 # Define a comparison function that returns -1 if 'a' is bigger than 'b', 1 if 'b' is greater than 'a' and 0 if the two variables are equal
@@ -33,6 +53,37 @@ def cmp(a, b):
 # Define orientation of the device - to be changed later to something that makes use of the final run function	
 Orientation = ['LANDSCAPE', 'PORTRAIT']
 
+# The number of free nodes of each type that are kept for reuse (see pool.py)
+POOL_CAPACITY = 32
+
+# Set to True to time every stage of the update function and show the statistics on screen (see profiler.py)
+PROFILE = False
+
+# A laser flies 1000 points up in LASER_TICKS ticks (half a second), and is removed at the end of its flight
+LASER_TICKS = 30
+LASER_SPEED = 1000/LASER_TICKS
+
+# A dead player drops off the bottom of the screen in DROP_TICKS ticks (half a second)
+DROP_TICKS = 30
+
+# The sound effects of the game, with the number of voices each may play at the same time (see audio.py)
+SOUND_EFFECTS = {
+	'arcade:Jump_5': 1,
+	'digital:PowerUp7': 2,
+	'arcade:Explosion_1': 1,
+	'arcade:Explosion_2': 3,
+	'arcade:Laser_1': 3,
+}
+
+# Set to a file name to record the session (seed, tilt and taps) when the scene is closed, so that it can be replayed exactly later (see replay.py)
+RECORD_TO = None
+
+# The database that keeps the high score and the history of finished games (see scores.py). Headless games (bots, sweeps, tests) do not write to it unless a store is given to them
+SCORES_TO = None if backend.HEADLESS else 'scores.db'
+
+# Set to a directory to write the events of every game there (landings, coins, kills and deaths, see telemetry.py)
+TELEMETRY_TO = None
+
 # Create classes for special in-game items	
 class Block(sc.SpriteNode):
 	def __init__(self, **kwargs):
@@ -50,18 +101,67 @@ class Cloud(sc.SpriteNode):
 		sc.SpriteNode.__init__(self, 'emj:Cloud', **kwargs)
 		
 class Monster(sc.SpriteNode):
-	def __init__(self, **kwargs):
-		# The Monster class randomply chooses an enemy from Monster_types defined earlier. In addition, an enemy_type method is created to make sure correct textures are chosen later.
-		
-		r = random.uniform(0,1)
+	def __init__(self, rng=random, **kwargs):
+		# The Monster class randomply chooses an enemy from Monster_types defined earlier (using the game's random number generator `rng`). In addition, an enemy_type method is created to make sure correct textures are chosen later.
+		self.rng = rng
+		self.enemy_type = self.random_type()
+		self.destroyed = False
+		sc.SpriteNode.__init__(self, monster_texture(self.enemy_type, 0), **kwargs)
+	
+	def random_type(self):
+		r = self.rng.uniform(0,1)
 		r = int(np.floor(10*r))
-		
-		self.enemy_type = Monster_types[r]
-		sc.SpriteNode.__init__(self, Monster_textures[self.enemy_type][0], **kwargs)
+		return Monster_types[r]
+	
+	# Called by the pool when a released Monster is reused: it comes back as a new, living, random enemy
+	def reset(self):
+		self.enemy_type = self.random_type()
+		self.texture = monster_texture(self.enemy_type, 0)
+		self.destroyed = False
+
+class Laser(sc.SpriteNode):
+	def __init__(self, **kwargs):
+		sc.SpriteNode.__init__(self, 'spc:LaserBlue9', **kwargs)
 			
 # ---[The Game
 class Game(sc.Scene):
+	# Seed for all the randomness in the game. None picks a different game every time; a fixed seed (e.g. set by simulation.Simulation before the game is presented) makes every run with the same input identical.
+	seed = None
+	
+	# Where the tilt and taps come from. None reads the device directly; a recorder or a replay (see replay.py) can be plugged in here
+	input_source = None
+	
+	# Difficulty: the highest game speed, how much the speed grows with every new block, and the chance per frame that items are spawned. Set them on an instance before it is presented to play a harder or easier game (see farm.py)
+	speed_cap = 3
+	speed_step = 0.01
+	item_chance = 0.01
+	
+	# The game logic runs in fixed ticks of 1/tick_rate seconds, at most max_frame_ticks of them per frame (see physics.FixedStep)
+	tick_rate = physics.TICK_RATE
+	max_frame_ticks = 8
+	
+	# Play sounds? None plays them with Pythonista and stays silent in the headless backend
+	audio_enabled = None
+	
+	# Build the world from a seeded level stream, chunk by chunk ahead of the camera (see level.py), instead of spawning blocks after every landing and items at random moments. level_seed picks the world; None draws a new one for every game from the game's seed
+	chunked_levels = False
+	level_seed = None
+	
+	# Where finished games are kept (a scores.ScoreStore). None opens SCORES_TO, if it is set
+	score_store = None
+	
+	# Where the events of the game go (a telemetry.EventBus). None writes them to TELEMETRY_TO, if it is set, or nowhere
+	events = None
+	
 	def setup(self):
+		# Record the session if asked to. The recorder picks the seed, so this has to happen before the random number generator is created
+		if RECORD_TO and self.input_source is None:
+			from replay import Recorder
+			Recorder(self.seed).attach(self)
+		
+		# All random numbers are drawn from generators owned by the game, never from the global `random` module
+		self.rng = random.Random(self.seed)
+		
 		# Define the orientation of the device
 		self.orientation = Orientation[1]
 		
@@ -73,6 +173,8 @@ class Game(sc.Scene):
 		# Create the player.
 		# A SpriteNode can be initialized from a `Texture` object or simply the name of a built-in image, which is used here
 		self.player = sc.SpriteNode('plf:AlienPink_front')
+		# The name of the texture the player shows (see set_player_texture)
+		self.player_texture = 'plf:AlienPink_front'
 		
 		# The `anchor_point` of a `SpriteNode` defines how its position/rotation is interpreted. By default, the position corresponds to the center of the sprite, but in this case, it's more convenient if the y coordinate corresponds to the bottom (feet) of the alien, so we can position it flush with the ground. The anchor point uses unit coordinates -- (0, 0) is the bottom-left corner, (1, 1) the top-right.
 		self.player.anchor_point = (0.5, 0)
@@ -80,25 +182,50 @@ class Game(sc.Scene):
 		self.player.position = (self.size.w/2, self.bottom)
 		self.add_child(self.player)
 		
-		# Define a jumping array which determines the vertical positions of the player during the jump
-		self.jump = np.array([0])
-		i = 0
-		acc = 45/(200)
-		self.vel = 10
-		while acc*i <= self.vel:
-			self.jump = np.append(self.jump, (self.vel - acc*i))
-			i += 1	
+		# Define a jumping array which determines the vertical positions of the player during the jump (see physics.py). The trajectory is shared by all games with the same jump
+		self.vel = physics.JUMP_VELOCITY
+		self.trajectory = physics.trajectory(self.vel, physics.JUMP_ACCELERATION)
+		self.jump = self.trajectory.steps
+		self.jump_period = self.trajectory.period
+		
+		# Turns the time between frames into game ticks. render_offset is how far the player is drawn ahead of its position in the game logic (between two ticks)
+		self.clock = physics.FixedStep(self.tick_rate, self.max_frame_ticks)
+		self.render_offset = 0
+		
+		self.max_jump = physics.max_jump(self.jump, self.bottom)
+		
+		# Which blocks can be reached from the one the player stands on, worked out once from the jump (see physics.Envelope)
+		self.reach = physics.envelope(self.vel, physics.JUMP_ACCELERATION)
 		
-		self.jump[i] = 0
-		self.jump = np.append(self.jump, - self.jump[::-1])
-		self.jump = self.jump[:-1]
+		# Blocks, items and lasers all live under one world node. When the player lands, only this node is scrolled down (the camera moves up), so the cost of scrolling does not depend on the number of things in the game. Everything under the world node uses world coordinates: the world y of the bottom of the screen is camera_y.
+		self.world = sc.Node(parent=self)
 		
-		self.max_jump = self.bottom + np.sum(self.jump[0:len(self.jump)/2])
+		# Define a new attribute to keep track of the coins and blocks that are in the game, so that we can check if any of them collides with the player. Coins, clouds and monsters live in an entity store (see entities.py), which moves all of them at once every frame:
+		self.items = EntityStore(np.random.RandomState(self.rng.getrandbits(32)))
 		
-		# Define a new attribute to keep track of the coins and blocks that are in the game, so that we can check if any of them collides with the player:
-		self.items = []
+		# All sound effects go through the mixer, which plays each of them at most once per frame (see audio.py)
+		enabled = self.audio_enabled if self.audio_enabled is not None else not backend.HEADLESS
+		self.audio = Mixer(SOUND_EFFECTS, enabled)
+		self.audio.preload(SOUND_EFFECTS)
+		
+		# Delayed events (removing destroyed monsters and lasers, starting a new game after a death) are timers counted in ticks, so they follow the simulation clock (see timers.py)
+		self.timers = TimerWheel()
+		self.lasers = []
+		
+		# The last snapshot taken with snapshot(); the next one shares whatever did not change with it
+		self.last_snapshot = None
+		
+		# Sprite properties that change every tick (item positions, facing, textures) go through the sync layer, which only writes what actually changed (see sprite_sync.py)
+		self.sprites = SpriteSync()
 		self.blocks = []
 		
+		# Sprites that come and go during the game are taken from (and given back to) a pool per type, instead of being created and thrown away every time
+		self.pools = dict((cls, NodePool(cls, POOL_CAPACITY)) for cls in (Block, Coin, Cloud, Laser))
+		self.pools[Monster] = NodePool(lambda: Monster(rng=self.rng), POOL_CAPACITY)
+		
+		# The blocks are also filed in a spatial grid, so that the jump check only has to look at the blocks near the player
+		self.block_grid = SpatialGrid()
+		
 		# The font of a `LabelNode` is set using a tuple of font name and size.
 		score_font = ('Futura', 40)
 		self.score_label = sc.LabelNode('0', score_font, parent=self)
@@ -117,19 +244,23 @@ class Game(sc.Scene):
 		self.high_score.anchor_point = (0,0)
 		self.high_score.position = (27, self.size.h - 95)
 		
-		self.high_score_val = 6793
-		
-		self.high_score.text = str(self.high_score_val)
+		# The best score ever comes from the score store (or starts at zero without one)
+		if self.score_store is None and SCORES_TO:
+			from scores import ScoreStore
+			self.score_store = ScoreStore(SCORES_TO)
+		self.high_score_val = self.score_store.best() if self.score_store is not None else 0
 		
-		# Run the new_game() to set everything to its initial state
-		self.new_game()
+		# The telemetry writer this game opened itself (it is closed with the game)
+		self.telemetry_writer = None
+		if self.events is None and TELEMETRY_TO:
+			self.telemetry_writer = telemetry.TelemetryWriter(TELEMETRY_TO)
+			self.events = self.telemetry_writer.session()
 		
+		self.high_score.text = str(self.high_score_val)
 		
-	
-	def new_game(self):
 		# Create the ground node...
 		# Usually, nodes are added to their parent using the 'add_child()' method, but for convenience, you can also pass
-		# the node's parent as a keyword argument for the same effect
+		# the node's parent as a keyword argument for the same effect. The ground is only built once; every new game simply puts it back into the scene
 		self.ground = sc.Node(parent=self)
 		ground_x = 0
 		tile_width = 64
@@ -140,25 +271,55 @@ class Game(sc.Scene):
 			self.ground.add_child(tile)
 			ground_x += tile_width
 		
+		# The frame profiler is off unless asked for
+		self.profiler = None
+		self.profiler_label = None
+		if PROFILE:
+			self.enable_profiler(overlay=True)
+		
+		# Number of the current game in this session
+		self.games = 0
+		
+		# Run the new_game() to set everything to its initial state
+		self.new_game()
+		
+		
+	
+	def new_game(self):
+		# Put the ground back (it is removed after the first jump)
+		if self.ground.parent is None:
+			self.add_child(self.ground)
 		
 		# Reset everything to its initial state...
 		for item in self.items:
-			item.remove_from_parent()
-		self.items = []
+			self.release(item)
+		self.items.clear()
 		
 		for block in self.blocks:
-			block.remove_from_parent()
+			self.release(block)
 		self.blocks = []
+		self.block_grid.clear()
 		
-		self.current_blocks = np.array([])
+		# The camera scroll after a landing: the distance the camera moves on each tick of the scroll (1/30 of the height of the block landed on, measured when landing)
+		self.scroll_step = 0.0
 		
+		for laser in self.lasers:
+			self.timers.cancel(laser.timer)
+			self.release(laser)
 		self.lasers = []
 		
-		# Create the first instance of a Block class. This will help with positioning of blocks later in the game
-		block = Block(parent=self)
-		block.position = (random.uniform(27, self.size.w-27), random.uniform(100, 200))
-		block.z_position = -1
-		self.blocks.append(block)
+		# Move the camera back to the start
+		self.camera_y = 0
+		self.world.position = (0, 0)
+		
+		# Create the first instance of a Block class. This will help with positioning of blocks later in the game. With chunked levels, the blocks come from the level stream instead (at the end of new_game)
+		self.level = None
+		self.level_items = []
+		if not self.chunked_levels:
+			block = self.spawn(Block, z_position=-1)
+			block.position = (self.rng.uniform(27, self.size.w-27), self.rng.uniform(100, 200))
+			self.blocks.append(block)
+			self.block_grid.insert(block, block.position.x, block.position.y)
 		
 		# Initialise jump counter and the jumped method to determine if the player has performed the first jump
 		self.count = -1
@@ -168,26 +329,88 @@ class Game(sc.Scene):
 		self.score = 0
 		self.score_label.text = '0'
 		self.player.position = (self.size.w/2, 32)
-		self.player.texture = jumping_texture
+		
+		# What the game is summarised by when it ends (see run_summary)
+		self.games += 1
+		self.game_start = self.timers.now
+		self.coins_collected = 0
+		self.landings = 0
+		self.set_player_texture(jumping_texture)
 		
 		# Set the difficulty of the game back to its initial state
 		self.speed = 1.0
 		
 		# The game_over attribute is set to True when the alien dies. We use this to stop player movement and collision checking (the update method simply does nothing when game_over is True).
 		self.game_over = False
+		# What ended the last game: 'monster' or 'fell' (None while the game is running)
+		self.death_cause = None
 		
 		# Check if the 'camera view' is moving
 		self.moving = False
 		self.jump_counter = 0
 		
+		# Whether the player is at the bottom of a jump (the jump sound plays when this becomes True)
+		self.touched_down = False
+		
+		# Ticks left of the drop off the screen after a death
+		self.drop_ticks = 0
+		
 		# Reset velocity scale and step of the enemies in the game
 		self.vel_scale = 1
 		self.step = 0
+		
+		# A new world for the new game, with items only above the first screen
+		if self.chunked_levels:
+			seed = self.level_seed if self.level_seed is not None else self.rng.getrandbits(32)
+			self.level = LevelStream(seed, self.size.w, Monster_types, self.speed_cap, self.speed_step, self.item_chance, self.size.h + 30, self.reach)
+			self.read_level()
+		
+		# All blocks share a texture, so half of its size is the margin needed when querying the grid
+		block = self.blocks[0]
+		self.block_margin = (block.size.w/2, block.size.h/2)
 	
 		
+	# Convert a screen y-coordinate to world coordinates (used for everything under the world node) and back
+	def to_world(self, y):
+		return y + self.camera_y
+	
+	def to_screen(self, y):
+		return y - self.camera_y
+	
+	# Scroll the camera up by dy: the world node is the only thing that moves
+	def scroll_camera(self, dy):
+		self.camera_y += dy
+		self.world.position = (0, -self.camera_y)
+	
 	# Create the update function that is called automatically ~60 times per second			
 	def update(self):
+		# Put the player back where the game logic left it before drawing it in between two ticks
+		if self.render_offset:
+			self.player.position = (self.player.position.x, self.player.position.y - self.render_offset)
+			self.render_offset = 0
+		
+		# Run as many ticks of game logic as fit in the time since the last frame. A slow frame runs several ticks, so the jump keeps its height and every tick is checked for landings; a headless simulation can step with large frames the same way
+		for i in range(self.clock.ticks(self.dt)):
+			self.tick()
+		
+		# Play the sounds asked for during this frame
+		self.audio.flush(self.t)
+		
+		# Draw the player part of the way to its position on the next tick
+		if self.clock.alpha and not self.moving and not self.game_over:
+			self.render_offset = self.trajectory.offset(self.count, self.clock.alpha)
+			self.player.position = (self.player.position.x, self.player.position.y + self.render_offset)
+	
+	# One tick (1/60 s) of game logic
+	def tick(self):
+		# Let the input source (if any) sample or replay this tick's tilt and taps
+		if self.input_source is not None:
+			self.input_source.tick(self)
+		
 		if self.game_over == False:
+			if self.level is not None:
+				self.read_level()
+			
 			self.update_player()
 			
 			# if the camera view is moving run the modified jump function
@@ -203,15 +426,30 @@ class Game(sc.Scene):
 			if self.jumped == True:
 				self.check_fall_off()
 				
-				# At random intervals, spawn items in the game
-				if random.random() < 0.01:
+				# At random intervals, spawn items in the game (with chunked levels, they come with the chunks)
+				if self.level is None and self.rng.random() < self.item_chance:
 					self.spawn_item()
-			
-			
 		
+		# Lasers keep flying after the game is over, and a dead player drops off the screen
+		self.move_lasers()
+		if self.drop_ticks:
+			self.drop_player()
+		
+		# Fire the events due on this tick
+		self.timers.advance()
+		
+		# Write the sprite properties that changed in this tick, all at once
+		self.sprites.flush()
+		
+	# The current orientation of the device, from the input source if there is one
+	def read_gravity(self):
+		if self.input_source is not None:
+			return self.input_source.gravity
+		return sc.gravity()
+	
 	def update_player(self):
 		# The gravity() function returns an (x, y, z) vector that describes the current orientation of your device.
-		x,y,z = sc.gravity()
+		x,y,z = self.read_gravity()
 		
 		# Determine player's position
 		pos = self.player.position
@@ -220,13 +458,13 @@ class Game(sc.Scene):
 		if self.moving == False:
 			self.count += 1
 		
-			pos.y = pos.y + self.jump[self.count % len(self.jump)]	
+			pos.y = pos.y + self.jump[self.count % self.jump_period]	
 
 		# Determine if the relevant accelerations are of significant magnitude 
 		g = [abs(x)>0.01,abs(y)>0.01]
 		
 		# The components of the gravity vector are in the range 0.0 to 1.0, so we have to multiply it with some factor to move the player more quickly. 35 works pretty well, but feel free to experiment. 
-		max_speed = 35
+		max_speed = physics.MAX_SPEED
 		
 		# Check the orientation. In Ladnscape orientation, the x direction of movement corresponds to the y coordinate of the accelerometer
 		if any(g) and self.orientation == 'LANDSCAPE':
@@ -238,14 +476,14 @@ class Game(sc.Scene):
 			pos.x = max(27, min(self.size.w-27, pos.x))
 			
 			# Ensure that the player is facing in the direction of motion using appropriate scaling 
-			self.player.x_scale = cmp(-y, 0)
+			self.sprites.set(self.player, 'x_scale', cmp(-y, 0))
 			
 		elif any(g) and self.orientation == 'PORTRAIT':
 			
 			# apply similar equations in the Portrait case
 			pos.x += x*max_speed
 			pos.x = max(27, min(self.size.w - 27, pos.x))
-			self.player.x_scale = cmp(x, 0)
+			self.sprites.set(self.player, 'x_scale', cmp(x, 0))
 		
 		# Update the final player position	
 		self.player.position = pos
@@ -253,146 +491,130 @@ class Game(sc.Scene):
 		
 		# Create appropriate textures for more fluid motion
 		if pos.y < 70:
-			self.player.texture = landing_texture
+			self.set_player_texture(landing_texture)
 			
+			# The jump sound plays once when the player touches down, not on every frame spent at the bottom
 			if pos.y < 33:
-				sound.play_effect('arcade:Jump_5', 0.05)
+				if not self.touched_down:
+					self.touched_down = True
+					self.audio.play('arcade:Jump_5', 0.05)
+			else:
+				self.touched_down = False
 		else:
-			self.player.texture = jumping_texture
+			self.touched_down = False
+			self.set_player_texture(jumping_texture)
 	
 	
 	# Create a function for spawning coins in the game
 	def spawn_item(self):
 		
 		# Create an instance of the Coin class, ensuring that its position is within the x-bounds and above the camera window in the y direction
-		coin = Coin(parent=self)
-		coin.position = (random.uniform(27, self.size.w-27), self.size.h + 30)
+		coin = self.spawn(Coin)
+		coin.position = (self.rng.uniform(27, self.size.w-27), self.to_world(self.size.h + 30))
 		
-		# Also add the coin to the `items` list (used for checking collisions):
-		self.items.append(coin)
+		# Also add the coin to the `items` store (used for moving it and checking collisions):
+		self.items.add(COIN, coin)
 		
 		# Spawn clouds
 		# make clouds rarer than coins
-		if random.random() < 2:
-			cloud = Cloud(parent=self)
-			cloud.position = (random.uniform(-50, self.size.w - 100), random.uniform(self.size.h+200, self.size.h + 600))
-			
+		if self.rng.random() < 2:
 			# Ensure that Clouds appear below everything else in the game
-			cloud.z_position = -2
+			cloud = self.spawn(Cloud, z_position=-2)
+			cloud.position = (self.rng.uniform(-50, self.size.w - 100), self.to_world(self.rng.uniform(self.size.h+200, self.size.h + 600)))
 
-			# Also add the cloud to the `items` list (used for checking collisions):
-			self.items.append(cloud)
+			# Also add the cloud to the `items` store:
+			self.items.add(CLOUD, cloud)
 			
 		# Spawn enemies:
-		if random.random() < 0.09 * self.speed:
-			monster = Monster(parent = self)
-			monster.position = (random.uniform(50, self.size.w-50), random.uniform(self.size.h+100, self.size.h + 400))
+		if self.rng.random() < 0.09 * self.speed:
+			monster = self.spawn(Monster)
+			monster.position = (self.rng.uniform(50, self.size.w-50), self.to_world(self.rng.uniform(self.size.h+100, self.size.h + 400)))
 			# create a new method for the monster class and set it to false. This will help with checking if the player has destroyed the enemy
 			monster.destroyed = False
-			self.items.append(monster)
+			self.items.add(MONSTER, monster)
 			
 			
 	
+	# Turn the chunks of the level stream that reached the top of the screen into sprites, and have the next chunks generated ahead of time (on the level stream's background thread). Blocks never move, so they are placed as soon as their chunk is reached; coins, clouds and monsters move from the moment they exist, so they wait (in a heap, lowest first) until they are about to come into view, as the items of the classic game appear just above the top of the screen
+	def read_level(self):
+		pending = self.level_items
+		for chunk in self.level.take(self.to_world(self.size.h)):
+			for x, y in chunk.blocks:
+				block = self.spawn(Block, position=(x, y), z_position=-1)
+				self.blocks.append(block)
+				self.block_grid.insert(block, x, y)
+				self.speed = min(self.speed_cap, self.speed + self.speed_step)
+			for x, y in chunk.coins:
+				heapq.heappush(pending, (y, COIN, x, ''))
+			for x, y in chunk.clouds:
+				heapq.heappush(pending, (y, CLOUD, x, ''))
+			for x, y, enemy_type in chunk.monsters:
+				heapq.heappush(pending, (y, MONSTER, x, enemy_type))
+		
+		top = self.to_world(self.size.h + 30)
+		while pending and pending[0][0] <= top:
+			y, kind, x, enemy_type = heapq.heappop(pending)
+			if kind == COIN:
+				self.items.add(COIN, self.spawn(Coin, position=(x, y)))
+			elif kind == CLOUD:
+				self.items.add(CLOUD, self.spawn(Cloud, position=(x, y), z_position=-2))
+			else:
+				monster = self.spawn(Monster, position=(x, y))
+				monster.enemy_type = enemy_type
+				monster.texture = monster_texture(enemy_type, 0)
+				self.items.add(MONSTER, monster)
+		self.level.prefetch()
+	
 	# Apply an analogus function to spawn_item to create new blocks in the game. A separate function is created to account for the differences in the behaviour of the two objects	
 	def spawn_blocks(self):
 			
 		# Make sure that a finite number of blocks is present in the game at any given time
-		if len(list(self.blocks)) < 10:
-			block = Block(parent=self)
+		if len(self.blocks) < 10:
+			block = self.spawn(Block, z_position=-1)
 			
-			# Define the block position in terms of the position of the previously created block. This ensures that blocks are a reasonable distance apart and the game is not impossible
-			block.position = (random.uniform(27, self.size.w-27), random.uniform(list(self.blocks)[-1].position.y + 50, list(self.blocks)[-1].position.y + 220))
-			block.z_position = -1
+			# Define the block position in terms of the position of the previously created block. This ensures that blocks are a reasonable distance apart, and the reachability envelope makes sure the game is not impossible: a block too far to the side to be reached from the previous one is placed again within reach (with the default jump every block on the screen can be reached, so this never happens)
+			last = self.blocks[-1].position
+			x = self.rng.uniform(27, self.size.w-27)
+			y = self.rng.uniform(last.y + 50, last.y + min(220, self.reach.max_height))
+			reach = self.reach.distance(y - last.y)
+			if abs(x - last.x) > reach:
+				x = self.rng.uniform(max(27, last.x - reach), min(self.size.w-27, last.x + reach))
+			block.position = (x, y)
 			
-			# Append the block to the blocks list to help check for jump and fall-offs
-			self.blocks.append(block)	
+			# Append the block to the blocks list (and the grid) to help check for jump and fall-offs
+			self.blocks.append(block)
+			self.block_grid.insert(block, block.position.x, block.position.y)
 		
 		# The speed function will be modified every time a block is created to make the game more challenging with progress
-		self.speed = min(3, self.speed + 0.01)
+		self.speed = min(self.speed_cap, self.speed + self.speed_step)
 	
 		
 	def update_items(self):
+
+		# Move every coin (falling), cloud (drifting right) and Monster (walking left and right, faster with the speed of the game) in a few array operations. Items that went below the camera window are dropped from the store and returned
+		self.vel_scale, removed = self.items.update(self.size.w, self.camera_y, self.speed, self.vel_scale)
 		
-		for item in list(self.items):
-			
-			# if current_block exists, the player is in the process of jumping. In that case, move all items by the size of the jump downwards
-			if self.current_blocks.size:
-				
-				pos = item.position
-				pos.y = pos.y - self.current_blocks[0]/30
-				item.position = pos
-			
-				
-			# If an item is below the camera window, remove it from the game and from the item list	
-			if item.position.y < 0:
-				item.remove_from_parent()
-				item.run_action(sc.Action.remove())
-				self.items.remove(item)	
-			
-			# If the item is a coin, assign it a velocity and move it by that amount in the y-direction	
-			if isinstance(item, Coin):
-				# The coin's velocity is randomly chosen to create a fall duration of between 2 and 4 seconds:
-				v = random.uniform(self.size.w/(2.0*60), self.size.w/(4.0*60))
-				
-				
-				pos = item.position
-				pos.y = pos.y - v
-				item.position = pos
-			
-			# If the item is a cloud, assign it a velocity and move it by that amount in the x-direction			
-			if isinstance(item, Cloud):
-				v = random.uniform(self.size.w/(25*60), self.size.w/(40*60))
-				
-				pos = item.position
-				pos.x = pos.x + v
-				item.position = pos
-				
-				# in case a cloud moves outside the camera window, remove it from the game and from the item list
-					
-				if item.position.x > self.size.w + 30:
-					item.remove_from_parent()
-					item.run_action(sc.Action.remove())
-					self.items.remove(item)	
-			
-			# if the item is a Monster, assign it a velocity and move it left and right in a periodic fashion	
-			if isinstance(item, Monster):
-				v = random.uniform(self.size.w/(5*60), self.size.w/(10*60))
-					
-				# If the monster is close to the right-hand edge of the screen, change the velocity scale to negtive to reverse its motion. The equivalent operation is done when the Monster moves to the left hand side of the screen		
-				if item.position.x > self.size.w - 40:
-					self.vel_scale = -1
-				elif item.position.x < 40:
-					self.vel_scale = 1
-		  
-		  		# Update Monster position
-				pos = item.position	
-				pos.x = pos.x + v * self.speed * self.vel_scale
-				
-				item.position = pos
-				
-				# Scale the monster so that it faces the direction of motion. Additionally, make the monsters bigger with the speed of the game (it is incremented in the block spawning function)
-				item.x_scale = -self.vel_scale*self.speed
-				item.y_scale = self.speed
-				
-				# The step is defined so that it changes after the monster moves 20 pixels. This will help generate the appropriate texture and fluid motion
-				step = int(pos.x / 20) % 2
-				
-				# Change the Monster's texture depending on the current step
-				item.texture = Monster_textures[item.enemy_type][step]
+		for item in removed:
+			self.release(item)
+		
+		# Only now are the new positions written to the sprites. Monsters are also scaled to face the direction of motion and grow with the speed of the game, and their texture changes every 20 pixels to animate their steps
+		self.items.sync(self.speed, monster_texture, self.sprites)
 				
 				
 				
 	# Define a function for item collection																						
 	def collect_item(self, item, value = 10):
-		sound.play_effect('digital:PowerUp7')
+		self.audio.play('digital:PowerUp7')
+		pos = item.position
+		self.event(telemetry.COIN, pos.x, pos.y, value=value)
 		
 		# Ensure that the collected items are removed from the game and the record
-		item.remove_from_parent()
-		item.run_action(sc.Action.remove())
-		self.items.remove(item)	
+		self.items.remove(item)
+		self.release(item)
 		
 		# Add appropriate increment to the total score (and check if the high score was broken)
 		self.score += value
+		self.coins_collected += 1
 		self.score_label.text = str(self.score)	
 		self.high_score_val = max(self.score, self.high_score_val)						
 		self.high_score.text = str(self.high_score_val)
@@ -407,38 +629,47 @@ class Game(sc.Scene):
 				self.lasers.remove(laser)
 				continue
 			
-			# iterate over all Monsters in the items list
-			for item in self.items:
-				if not isinstance(item, Monster):
-					continue
+			# iterate over the Monsters near the laser. The grid returns every monster that could possibly contain the laser's position (monsters grow with the speed of the game)
+			pos = laser.position
+			monsters = self.items.monsters
+			for item in monsters.near(pos.x, pos.y, pos.x, pos.y, self.speed):
 				if item.destroyed:
 					continue
 				
-				# if the laster overlaps with the monster, destroy the monster and remove the laser from the game
-				if laser.position in item.frame:
+				# if the laster overlaps with the monster, destroy the monster and remove the laser from the game. The monsters have already moved in this tick, so their frame comes from the entity store (the sprites only get the new positions at the end of the tick)
+				x, y, w, h = monsters.rect(item)
+				if x <= pos.x < x + w and y <= pos.y < y + h:
 					self.destroy_monster(item)
-					laser.run_action(sc.Action.remove())
-					self.lasers.remove(laser)
-					laser.remove_from_parent()
+					self.remove_laser(laser)
 					break
 					
 	# Define a function for destroying monsters						
 	def destroy_monster(self, monster):
-		sound.play_effect('arcade:Explosion_2', 0.2)
+		self.audio.play('arcade:Explosion_2', 0.2)
+		
+		# The writes queued for the monster in this tick (its walking texture among them) would land on top of the changes below, so drop them and freeze it where the entity store has it now
+		monsters = self.items.monsters
+		i = monsters.nodes.index(monster)
+		x, y = float(monsters.x[i]), float(monsters.y[i])
+		x_scale, y_scale = float(monsters.shown_xs[i]), float(monsters.shown_ys[i])
+		self.sprites.forget(monster)
+		monster.position = (x, y)
+		monster.x_scale = x_scale
+		monster.y_scale = y_scale
 		
 		# Change the monster texture to dead
-		monster.texture = Monster_textures[monster.enemy_type][2]
+		monster.texture = monster_texture(monster.enemy_type, 2)
 		
 		# Modify the opacity of the texture to make it clear that the monster is dead
 		monster.alpha = 0.5
 		
 		# Modify the destroyed method
 		monster.destroyed = True
+		self.event(telemetry.KILL, x, y, value=Monster_types.index(monster.enemy_type))
 		
-		# Run action sequence to freeze the destroyed monster for one second. Afterwards, remove it from the game
-		monster.run_action(sc.Action.sequence(sc.Action.wait(1),sc.Action.remove()))
+		# Run action sequence to freeze the destroyed monster for one second. Afterwards, remove it from the game (and give it back to its pool)
+		self.after(1, self.release, monster)
 		self.items.remove(monster)
-		monster.remove_from_parent
 		
 		# Create some left over pieces:
 		#for i in range(5):
@@ -451,49 +682,67 @@ class Game(sc.Scene):
 	# Create a function to check for item collisions with the player			
 	def check_item_collisions(self):
 		
-		# Define a player hitbox as a rectangle around the player
-		player_hitbox = sc.Rect(self.player.position.x - 20, self.player.position.y, 40, 65)
-		
-		# for each item in the game check if the item intersects the hitbox. Run the collection function if appropriate
-		for item in list(self.items):
-			if isinstance(item, Coin):
-				if item.frame.intersects(player_hitbox):
-					self.collect_item(item)
-				#	 When a coin has finished its animation, it is automatically removed from the scene by its Action sequence. When that's the case, also remove it from the `items` list, so it isn't checked for collisions anymore:
-				elif not item.parent:
-					self.items.remove(item)
-			if isinstance(item, Monster):
-				if item.frame.intersects(player_hitbox):
-					self.player_dead()
+		# Define a player hitbox as a rectangle around the player (in world coordinates, like the items)
+		player_hitbox = sc.Rect(self.player.position.x - 20, self.to_world(self.player.position.y), 40, 65)
+		
+		# for each coin near the player check if the coin intersects the hitbox. Run the collection function if appropriate
+		for item in self.items.coins.near(player_hitbox.x, player_hitbox.y, player_hitbox.x + player_hitbox.w, player_hitbox.y + player_hitbox.h):
+			if item.frame.intersects(player_hitbox):
+				self.collect_item(item)
+			#	 When a coin has finished its animation, it is automatically removed from the scene by its Action sequence. When that's the case, also remove it from the `items` store, so it isn't checked for collisions anymore:
+			elif not item.parent:
+				self.items.remove(item)
+		
+		# Touching a Monster ends the game
+		for item in self.items.monsters.near(player_hitbox.x, player_hitbox.y, player_hitbox.x + player_hitbox.w, player_hitbox.y + player_hitbox.h, self.speed):
+			if item.frame.intersects(player_hitbox):
+				self.player_dead('monster')
 				
 	# Define a function to check whether a successful jump was made			
 	def check_jump(self):
-		# Define a player hitbox as a rectangle around the player
-		player_hitbox = sc.Rect(self.player.position.x - 20, self.player.position.y, 40, 65)
+		# Define a player hitbox as a rectangle around the player (in world coordinates, like the blocks)
+		player_hitbox = sc.Rect(self.player.position.x - 20, self.to_world(self.player.position.y), 40, 65)
+		
+		# Landing is only possible while the player is falling
+		if self.jump[self.count % self.jump_period] >= 0:
+			return
 		
-		# Iterate over blocks in the game
-		for block in list(self.blocks):
+		# Iterate over the blocks near the player. Blocks never move in world coordinates, so the grid needs no updating
+		for block in self.block_grid.query_rect(player_hitbox, *self.block_margin):
 			
-			# check if the block position overlaps with the player, while the player is falling 
-			if self.vel+np.round(32+block.position.y,0) > self.player.position.y and np.round(32+block.position.y,0)-self.vel < self.player.position.y and block.frame.intersects(player_hitbox) and self.jump[self.count % len(self.jump)] < 0:
+			# The height of the block on the screen, and of its top edge rounded to whole points
+			block_y = self.to_screen(block.position.y)
+			top = round(32 + block_y)
+			
+			# check if the block position overlaps with the player
+			y = self.player.position.y
+			if self.vel + top > y and top - self.vel < y and block.frame.intersects(player_hitbox):
+				
+				# if the condition is satisfied, the player has performed a succesful jump. The camera view should now be shifted up by the height of the block, which modified_jump() does over the next 30 frames by scrolling the world node
 				
-				# if the condition is satisfied, the player has performed a succesful jump. The camera view should now be shifted. This can be done by moving all in-game blocks by the distance of the jump
+				# The gap from the block jumped from (or from the ground, at the start of a game), measured before that block may be removed below
+				if self.jumped:
+					gap_x = block.position.x - self.current_block.position.x
+					gap_y = block.position.y - self.current_block.position.y
+				else:
+					gap_x, gap_y = 0.0, block.position.y
 				
 				for b in list(self.blocks):
-					b.run_action(sc.Action.move_by(0, -block.position.y,0.5, sc.TIMING_SINODIAL))
 					
-					# Additionally, if blocks have moved below the current camera view, they should be removed from the game
-					if b.position.y < 0:
-						b.remove_from_parent()
-						b.run_action(sc.Action.remove())
+					# If blocks are below the current camera view, they should be removed from the game
+					if self.to_screen(b.position.y) < 0:
+						self.release(b)
 						self.blocks.remove(b)
+						self.block_grid.remove(b)
 	
 				# Reset the counter to 1 and the player position to 32 (corresponds to the start of a new jump)
 				self.count = -1
 				self.player.position.y = 32
 				
-				# Change the moving function to True to ensure that a correct, modified jump mechanics are applied
+				# Change the moving function to True to ensure that a correct, modified jump mechanics are applied. The camera will move up by block_y over the next 30 ticks of modified_jump()
 				self.moving = True
+				self.jump_counter = 0
+				self.scroll_step = block_y/30
 				
 				# Make sure that the ground is removed from the game
 				self.ground.run_action(sc.Action.remove())
@@ -502,13 +751,16 @@ class Game(sc.Scene):
 				self.current_block = block
 				self.jumped = True
 				
-				self.player.texture = landing_texture
+				self.set_player_texture(landing_texture)
+				self.landings += 1
 				
 				# Increment the score by the normalised jump distance
-				self.score += int(np.round(block.position.y/10,0))
+				points = int(round(block_y/10))
+				self.score += points
 				self.score_label.text = str(self.score)	
 				self.high_score_val = max(self.score, self.high_score_val)
 				self.high_score.text = str(self.high_score_val)
+				self.event(telemetry.LANDING, block.position.x, block.position.y, gap_x, gap_y, points)
 	
 	def modified_jump(self):
 		# 0.5 s = 30 iterations
@@ -519,25 +771,25 @@ class Game(sc.Scene):
 		pos = self.player.position
 		self.count += 1
 		
-		self.current_blocks = np.append(self.current_blocks, self.current_block.position.y)
-		
-		# Not sure if this if statement does anything
-		if pos.y + self.jump[self.count % len(self.jump)] > 32:
-			pos.y = pos.y + self.jump[self.count % len(self.jump)] - list(self.current_blocks)[0]/30
+		# The jump continues, minus the camera movement (as long as the player stays above the ground)
+		dy = self.jump[self.count % self.jump_period]
+		if pos.y + dy > 32:
+			pos.y = pos.y + dy - self.scroll_step
 				
 		self.player.position = pos
 		
+		# The camera follows by the same 1/30th of the landing height on each of the 30 ticks, so that the block the player landed on ends up exactly at the bottom of the screen (everything in the world moves down on screen)
+		self.scroll_camera(self.scroll_step)
+		
 		if self.count > 1:
-			self.player.texture = jumping_texture
+			self.set_player_texture(jumping_texture)
 		
 		# For the case of 0.5s camera movement, this function should only run 30 times. This is enabled by the following if statement
 		self.jump_counter += 1
 		if self.jump_counter == 30:
-			self.jump[self.count % len(self.jump)]
 			self.moving = False
 			self.jump_counter = 0
-			self.current_blocks = np.array([])
-			while len(list(self.blocks)) < 6:
+			while self.level is None and len(self.blocks) < 6:
 				self.spawn_blocks()
 							
 	
@@ -545,34 +797,170 @@ class Game(sc.Scene):
 	def check_fall_off(self):
 		
 		# If the player is at the bottom of the jump, see if the block frame intersects the player hitbox
-		if self.count  % len(self.jump) == 0:
-			player_hitbox = sc.Rect(self.player.position.x - 20, self.player.position.y-5, 40, 65)
+		if self.count % self.jump_period == 0:
+			player_hitbox = sc.Rect(self.player.position.x - 20, self.to_world(self.player.position.y)-5, 40, 65)
 			
 			block = self.current_block
 			if block.frame.intersects(player_hitbox):
 				fall = False
 			else:
 				fall = True
-				self.run_action(sc.Action.call(self.player_dead))	
+				self.timers.schedule(0, self.player_dead, 'fell')
 	
 							
-	def player_dead(self):
-		# If any of the conditions for the end of the game are satisfied, the player simply drops off the screen, and after 2 seconds, a new game is started.
+	def player_dead(self, cause=None):
+		# If any of the conditions for the end of the game are satisfied, the player simply drops off the screen, and after 2 seconds times the game speed (2 to 6 seconds, as in the original game), a new game is started. Touching several monsters at once still only ends the game once.
+		if self.game_over:
+			return
+		self.death_cause = cause
 		self.game_over = True
-		sound.play_effect('arcade:Explosion_1')
-		self.player.texture = dead_texture
-		self.player.run_action(sc.Action.move_by(0, -self.size.h))
-		# Note: The duration of the `wait` action is multiplied by the current game speed, so that it always takes exactly 2 seconds, regardless of how fast the rest of the game is running.
-		self.run_action(sc.Action.sequence(sc.Action.wait(2*self.speed), sc.Action.call(self.new_game)))	
+		pos = self.player.position
+		self.event(telemetry.DEATH, pos.x, self.to_world(pos.y), value=telemetry.CAUSES.get(cause, 0))
+		self.audio.play('arcade:Explosion_1')
+		self.set_player_texture(dead_texture)
+		self.drop_ticks = DROP_TICKS
+		self.after(2*self.speed, self.new_game)
+		
+		# Keep the finished game (the store writes it in the background)
+		if self.score_store is not None:
+			self.score_store.add(self.run_summary())
+	
+	# The finished (or current) game as a row of the score store (played by a person: bots add their policy, see farm.py)
+	def run_summary(self):
+		return {
+			'seed': self.seed,
+			'game': self.games,
+			'speed_cap': self.speed_cap,
+			'speed_step': self.speed_step,
+			'item_chance': self.item_chance,
+			'score': self.score,
+			'height': self.camera_y,
+			'ticks': self.timers.now - self.game_start,
+			'cause': self.death_cause,
+			'coins': self.coins_collected,
+			'landings': self.landings,
+			'speed': self.speed,
+		}
 			
 		
 	# When a touch is applied to the screen, a laser is shot from the player. 
 	def touch_began(self, touch):
-		laser = sc.SpriteNode('spc:LaserBlue9', position=self.player.position, z_position = -1, parent = self)
-		laser.run_action(sc.Action.sequence(sc.Action.move_by(0,1000), sc.Action.remove()))
-		self.lasers.append(laser)
-		sound.play_effect('arcade:Laser_1')
-		
+		if self.input_source is not None:
+			self.input_source.touch()
 		
+		# Taps arrive between frames, while the player is drawn render_offset ahead of the game logic. The laser starts from where the logic has the player, as it does when a replay fires the tap inside tick()
+		pos = self.player.position
+		laser = self.spawn(Laser, position=(pos.x, self.to_world(pos.y - self.render_offset)), z_position = -1)
+		# move_lasers() moves it on every tick, and a timer removes it at the end of its flight
+		laser.timer = self.timers.schedule(LASER_TICKS - 1, self.remove_laser, laser)
+		self.lasers.append(laser)
+		self.audio.play('arcade:Laser_1')
+	
+	# Move a dead player down by one tick's part of the screen height. The drop is counted in ticks like everything else, so it can be snapshotted and does not depend on the frame rate
+	def drop_player(self):
+		pos = self.player.position
+		self.player.position = (pos.x, pos.y - self.size.h/DROP_TICKS)
+		self.drop_ticks -= 1
+	
+	def remove_laser(self, laser):
+		self.timers.cancel(laser.timer)
+		if laser in self.lasers:
+			self.lasers.remove(laser)
+		self.release(laser)
+	
+	def move_lasers(self):
+		for laser in self.lasers:
+			pos = laser.position
+			laser.position = (pos.x, pos.y + LASER_SPEED)
+	
+	# Report an event of this game (see telemetry.py), with the tick within the game, the speed and the score
+	def event(self, kind, x, y, dx=0.0, dy=0.0, value=0.0):
+		if self.events is not None:
+			self.events.emit(self.games, kind, self.timers.now - self.game_start, self.speed, self.score, x, y, dx, dy, value)
+	
+	# Report the game in progress as cut short (the recording stops before the game ended), so that survival curves count it as still running up to now
+	def end_events(self):
+		if self.games and not self.game_over:
+			pos = self.player.position
+			self.event(telemetry.END, pos.x, self.to_world(pos.y))
+	
+	# Call callback(*args) after `seconds` of game time (counted in ticks)
+	def after(self, seconds, callback, *args):
+		return self.timers.schedule(int(round(seconds*self.tick_rate)), callback, *args)
+	
+	# Copy the whole state of the game, to go back to it later with restore() (see snapshot.py)
+	def snapshot(self):
+		self.last_snapshot = snapshot.capture(self, self.last_snapshot)
+		return self.last_snapshot
+	
+	# Put the game back in the state of a snapshot; it then continues exactly as it did after the snapshot was taken
+	def restore(self, s):
+		snapshot.restore(self, s)
+	
+	# Start timing every stage of update() (keeping the last `history` frames), optionally with the statistics shown in a label at the bottom of the screen
+	def enable_profiler(self, history=600, overlay=False):
+		self.disable_profiler()
+		self.profiler = FrameProfiler(history=history)
+		self.profiler.instrument(self)
+		if overlay:
+			self.profiler_label = sc.LabelNode('', ('Menlo', 10), parent=self)
+			self.profiler_label.anchor_point = (0, 0)
+			self.profiler_label.position = (5, 5)
+			self.profiler_label.z_position = 2
+			self.profiler.overlay = self.profiler_label
+		return self.profiler
+	
+	def disable_profiler(self):
+		if self.profiler is not None:
+			self.profiler.uninstrument(self)
+			self.profiler = None
+		if self.profiler_label is not None:
+			self.profiler_label.remove_from_parent()
+			self.profiler_label = None
+	
+	# Take a sprite from the pool of its type and add it to the world node
+	def spawn(self, cls, position=(0, 0), z_position=0):
+		return self.pools[cls].acquire(self.world, position, z_position)
+	
+	# Remove a sprite from the game and give it back to its pool
+	def release(self, node):
+		self.sprites.forget(node)
+		self.pools[type(node)].release(node)
+	
+	# Show the player texture called `name`. The texture is only looked up when it changes
+	def set_player_texture(self, name):
+		if name != self.player_texture:
+			self.player_texture = name
+			self.sprites.set(self.player, 'texture', textures.get(name))
+	
+	# Load counts, timings and evictions of the texture cache
+	def texture_stats(self):
+		return textures.stats()
+	
+	# Property writes staged, written and saved by the sprite sync layer
+	def sync_stats(self):
+		return self.sprites.stats()
+	
+	# Hits, misses and high-water marks of every pool, keyed by the name of the sprite class
+	def pool_stats(self):
+		return dict((cls.__name__, pool.stats()) for cls, pool in self.pools.items())
+		
+		
+	# Called when the scene is closed: save the recording, if there is one, and write the last finished games and events
+	def stop(self):
+		if RECORD_TO and hasattr(self.input_source, 'save'):
+			self.input_source.save(RECORD_TO)
+		# Both stores raise the error of their writer thread if it failed; the other one is still closed
+		try:
+			if self.events is not None:
+				self.end_events()
+				self.events.flush()
+			if self.telemetry_writer is not None:
+				self.telemetry_writer.close()
+		finally:
+			if self.score_store is not None:
+				self.score_store.close()
+	
+			
 if __name__ == '__main__':
 	sc.run(Game(), sc.PORTRAIT, show_fps = True) 
@@ -0,0 +1,79 @@
+# ---[ Audio mixer
+# The game asks for sound effects with play() from wherever they happen (landings, coins, explosions, lasers). Nothing is played right away: the requests of one frame are queued, duplicates are merged into a single request (at the loudest volume asked for), and flush() plays them once per frame. Each effect can only have a few voices playing at the same time; further requests for it are dropped until one of its voices has finished. Under laser spam that turns dozens of play_effect calls per second into a handful.
+#
+# The effects are loaded up front with preload(), so the first explosion does not stall a frame. A disabled mixer (the default in the headless backend, see Game.audio_enabled) replaces play() and flush() with no-ops, so audio costs nothing in simulations and benchmarks.
+from __future__ import division
+
+from backend import sound
+
+# Voices per effect, and how long one voice is taken to last (the effects are all short; nothing tells us when one has finished)
+DEFAULT_VOICES = 2
+VOICE_DURATION = 0.4
+
+
+def _noop(*args, **kwargs):
+	pass
+
+
+class Mixer(object):
+	def __init__(self, voices=None, enabled=True, player=None):
+		# effect name -> maximum number of voices
+		self.voices = dict(voices or {})
+		self.enabled = enabled
+
+		# Module with play_effect/load_effect (Pythonista's `sound` by default)
+		self.player = player if player is not None else sound
+
+		# effect name -> volume requested this frame, and the end times of the voices still playing
+		self.queue = {}
+		self.playing = {}
+
+		self.requested = 0
+		self.merged = 0
+		self.dropped = 0
+		self.played = 0
+
+		if not enabled:
+			self.play = _noop
+			self.flush = _noop
+			self.preload = _noop
+
+	def preload(self, names):
+		for name in names:
+			self.player.load_effect(name)
+
+	# Ask for `name` to be played this frame
+	def play(self, name, volume=1.0):
+		self.requested += 1
+		queued = self.queue.get(name)
+		if queued is None:
+			self.queue[name] = volume
+		else:
+			self.merged += 1
+			if volume > queued:
+				self.queue[name] = volume
+
+	# Play this frame's effects. `t` is the current time in seconds (the scene's clock)
+	def flush(self, t):
+		if not self.queue:
+			return
+		for name, volume in self.queue.items():
+			ends = [end for end in self.playing.get(name, ()) if end > t]
+			if len(ends) >= self.voices.get(name, DEFAULT_VOICES):
+				self.dropped += 1
+				self.playing[name] = ends
+				continue
+			self.player.play_effect(name, volume)
+			ends.append(t + VOICE_DURATION)
+			self.playing[name] = ends
+			self.played += 1
+		self.queue.clear()
+
+	def stats(self):
+		return {
+			'enabled': self.enabled,
+			'requested': self.requested,
+			'merged': self.merged,
+			'dropped': self.dropped,
+			'played': self.played,
+		}
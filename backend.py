@@ -0,0 +1,17 @@
+# ---[ Backend selection
+# The game logic only talks to the renderer and the speaker through the `sc` and `sound` names exported here. On iOS these are Pythonista's own `scene` and `sound` modules. Anywhere else (or when DOODLE_HEADLESS=1 is set, which is handy for running the simulation inside Pythonista too) the local headless stand-ins are used instead, so the same Game class can be stepped on a plain Linux box.
+
+import os
+
+HEADLESS = os.environ.get('DOODLE_HEADLESS', '') not in ('', '0')
+
+if not HEADLESS:
+	try:
+		import scene as sc
+		import sound
+	except ImportError:
+		HEADLESS = True
+
+if HEADLESS:
+	import headless_scene as sc
+	import headless_sound as sound
@@ -0,0 +1,233 @@
+# ---[ Game loop benchmarks
+# Runs a few scripted, seeded scenarios through the headless simulation and reports ticks per second and the time spent in every stage of Game.update. The results are compared against a stored baseline (bench_baseline.json), so a change that makes the game loop slower is caught before it reaches a device.
+#
+#   python benchmarks.py                       run everything and compare against the baseline
+#   python benchmarks.py --scenario laser_spam run a single scenario
+#   python benchmarks.py --update-baseline     store the current results as the new baseline
+#   python benchmarks.py --scroll              time the landing path tick by tick during a camera scroll
+#
+# Every scenario uses a fixed seed and scripted input, so the same code always plays exactly the same game. The final score and height are stored with the baseline as well: if they change, the change also altered the gameplay.
+#
+# Ticks per second depend on the machine, so they are not compared directly: every timed run is surrounded by runs of a fixed calibration workload, and a scenario is compared by its ticks per calibration run (the median over the timed runs). A baseline recorded on one machine then still holds on another, and on the same machine under changing load, within the tolerance.
+#
+# A single timed run can land 20-30% away from the median on a busy machine (the calibration runs are noisy too), so one or two runs are not enough to call a regression: with --repeat below MIN_REPEAT the comparison is printed but a SLOWER scenario does not fail the run. The default of 5 runs keeps an unchanged tree well within the tolerance.
+from __future__ import division, print_function
+
+import os
+os.environ.setdefault('DOODLE_HEADLESS', '1')
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+import bots
+from simulation import Simulation
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+# Timed runs per scenario by default, and the fewest that count as a regression check
+REPEAT = 5
+MIN_REPEAT = 3
+
+
+# ---[ Scenarios
+class Scenario(object):
+	def __init__(self, name, seed, ticks, policy, before_tick=None):
+		self.name = name
+		self.seed = seed
+		self.ticks = ticks
+		self.policy = policy
+
+		# Optional function called as before_tick(game, tick) to script the game itself (e.g. force a difficulty)
+		self.before_tick = before_tick
+
+
+# Keep the game at its top speed and spawn a wave of items every few frames, so there are always plenty of monsters around
+def dense_monsters(game, tick):
+	game.speed = 3
+	if not game.game_over and tick % 5 == 0:
+		game.spawn_item()
+
+
+SCENARIOS = [
+	Scenario('empty_start', 1, 3000, bots.idle),
+	Scenario('steady_climb', 2, 6000, bots.climber()),
+	Scenario('max_speed_monsters', 3, 3000, bots.climber(), dense_monsters),
+	Scenario('laser_spam', 4, 3000, bots.climber(fire_every=1)),
+]
+
+
+# ---[ Calibration
+# Calibration runs per second: a fixed mix of attribute and dict access, float arithmetic and small NumPy operations, like the work of a game tick. The mean over `runs` runs, so that it follows the speed of the machine over a stretch of time, as the scenarios do
+def calibrate(runs=10):
+	start = time.perf_counter()
+	for r in range(runs):
+		a = np.zeros(64)
+		seen = {}
+		total = 0.0
+		for i in range(20000):
+			a[i % 64] += 1.5
+			total += float(a[(i*7) % 64])
+			seen[i % 97] = total
+	return runs/(time.perf_counter() - start)
+
+
+# ---[ Running
+def play(scenario, profile=False):
+	sim = Simulation(seed=scenario.seed)
+	game = sim.game
+	profiler = game.enable_profiler(history=scenario.ticks) if profile else None
+
+	policy = scenario.policy
+	before_tick = scenario.before_tick
+	start = time.perf_counter()
+	for tick in range(scenario.ticks):
+		if before_tick is not None:
+			before_tick(game, tick)
+		tilt, touches = policy(game, tick)
+		sim.step(tilt, touches)
+	elapsed = time.perf_counter() - start
+	return sim, elapsed, profiler
+
+
+def run_scenario(scenario, repeat=REPEAT):
+	# Ticks per second are measured without the profiler (the best of `repeat` runs is shown, the median relative to the calibration is compared), the stage breakdown in one extra profiled run
+	best = None
+	relative = []
+	for i in range(repeat):
+		before = calibrate()
+		sim, elapsed, profiler = play(scenario)
+		calibration = (before + calibrate())/2
+		best = elapsed if best is None else min(best, elapsed)
+		relative.append(scenario.ticks/elapsed/calibration)
+	game = sim.game
+
+	sim, elapsed, profiler = play(scenario, profile=True)
+	return {
+		'ticks': scenario.ticks,
+		'seconds': best,
+		'tps': scenario.ticks/best,
+		'relative': float(np.median(relative)),
+		'score': game.score,
+		'height': round(game.camera_y, 3),
+		'stages_ms': dict((name, round(t, 5)) for name, t in profiler.means().items()),
+	}
+
+
+# ---[ Landing path micro-benchmark
+# Times the landing path on every tick of the camera scroll that follows a landing, grouped by how far into the scroll the tick is: modified_jump() (which moves the camera) and update_items() are timed together. Nothing in that path may grow while the camera moves, so the first and the last ticks of a scroll have to cost the same. Returns the median time in seconds for scroll ticks 1 to 30.
+def scroll_cost(seed=2, ticks=12000):
+	sim = Simulation(seed=seed)
+	game = sim.game
+	policy = bots.climber()
+	samples = [[] for i in range(31)]
+	clock = time.perf_counter
+
+	modified_jump = game.modified_jump
+	update_items = game.update_items
+	timing = [0, 0.0]
+
+	def timed_jump():
+		timing[0] = game.jump_counter + 1
+		start = clock()
+		modified_jump()
+		timing[1] = clock() - start
+
+	def timed_items():
+		start = clock()
+		update_items()
+		if timing[0]:
+			samples[timing[0]].append(timing[1] + clock() - start)
+			timing[0] = 0
+
+	game.modified_jump = timed_jump
+	game.update_items = timed_items
+	for tick in range(ticks):
+		tilt, touches = policy(game, tick)
+		sim.step(tilt, touches)
+
+	return [sorted(t)[len(t)//2] if t else 0.0 for t in samples[1:31]]
+
+
+def print_scroll_cost():
+	cost = scroll_cost()
+	for i, t in enumerate(cost):
+		print('scroll tick %2d %8.2f us' % (i + 1, t*1e6))
+	first = sum(cost[:5])/5
+	last = sum(cost[-5:])/5
+	print('last 5 / first 5 ticks: %.2f' % (last/first))
+
+
+# ---[ Baseline
+def load_baseline(path=BASELINE):
+	if not os.path.exists(path):
+		return {}
+	with open(path) as f:
+		return json.load(f)
+
+
+def save_baseline(results, path=BASELINE):
+	with open(path, 'w') as f:
+		json.dump(results, f, indent=1, sort_keys=True)
+		f.write('\n')
+
+
+# Compare one scenario against its baseline. Returns (status, speed ratio); status is 'ok', 'SLOWER' (more than `tolerance` below the baseline), 'CHANGED' (same speed check passed but the gameplay differs) or 'new'. The ratio is of ticks per calibration run (of plain ticks per second for a baseline without calibration)
+def compare(result, base, tolerance):
+	if not base:
+		return 'new', None
+	ratio = result['relative']/base['relative'] if 'relative' in base else result['tps']/base['tps']
+	if ratio < 1 - tolerance:
+		return 'SLOWER', ratio
+	if (result['score'], result['height']) != (base['score'], base['height']):
+		return 'CHANGED', ratio
+	return 'ok', ratio
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Benchmark the headless game loop')
+	parser.add_argument('--scenario', action='append', help='only run the named scenario (can be repeated)')
+	parser.add_argument('--repeat', type=int, default=REPEAT, help='timed runs per scenario (their median is compared; below %d, a slower scenario does not fail the run)' % MIN_REPEAT)
+	parser.add_argument('--tolerance', type=float, default=0.3, help='allowed slowdown (relative to the calibration workload) before a scenario counts as a regression')
+	parser.add_argument('--baseline', default=BASELINE)
+	parser.add_argument('--update-baseline', action='store_true')
+	parser.add_argument('--stages', action='store_true', help='print the per-stage breakdown')
+	parser.add_argument('--scroll', action='store_true', help='only time the landing path on every tick of a camera scroll')
+	args = parser.parse_args(argv)
+
+	if args.scroll:
+		print_scroll_cost()
+		return 0
+
+	scenarios = [s for s in SCENARIOS if not args.scenario or s.name in args.scenario]
+	baseline = load_baseline(args.baseline)
+
+	results = {}
+	failed = False
+	if args.repeat < MIN_REPEAT:
+		print('note: fewer than %d timed runs per scenario, SLOWER is not counted as a regression' % MIN_REPEAT)
+	print('%-20s %10s %10s %8s %8s  %s' % ('scenario', 'ticks/s', 'baseline', 'ratio', 'score', 'status'))
+	for scenario in scenarios:
+		result = run_scenario(scenario, args.repeat)
+		results[scenario.name] = result
+		base = baseline.get(scenario.name)
+		status, ratio = compare(result, base, args.tolerance)
+		failed = failed or (status == 'SLOWER' and args.repeat >= MIN_REPEAT)
+		print('%-20s %10.0f %10s %8s %8d  %s' % (scenario.name, result['tps'], '%.0f' % base['tps'] if base else '-', '%.2f' % ratio if ratio else '-', result['score'], status))
+		if args.stages:
+			for name, ms in sorted(result['stages_ms'].items(), key=lambda item: -item[1]):
+				print('    %-24s %8.4f ms' % (name, ms))
+
+	if args.update_baseline:
+		baseline.update(results)
+		save_baseline(baseline, args.baseline)
+		print('baseline written to %s' % args.baseline)
+		return 0
+	return 1 if failed else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
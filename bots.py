@@ -0,0 +1,58 @@
+# ---[ Bot policies
+# A policy is called as policy(game, tick) before every simulated frame and returns a (tilt, touches) pair: the (x, y) tilt of the device and the number of taps on the screen (each tap fires a laser). Policies only look at the game, so with a seeded game they always play the same way.
+from __future__ import division
+
+import physics
+
+
+# Hold the device flat and never tap
+def idle(game, tick):
+	return (0.0, 0.0), 0
+
+
+# Steer towards the lowest block above the one the player stands on that can be reached from it (see physics.Envelope; a block out of reach is only aimed for when there is nothing else). The target is picked once per jump, when the player takes off, and the tilt is proportional to the horizontal distance (the player moves physics.MAX_SPEED points per frame at full tilt). On the frame after a landing the player holds still: that frame checks that it is standing on the block (check_fall_off), and moving already would make it fall off. With fire_every > 0, a laser is fired every `fire_every` frames.
+def climber(fire_every=0):
+	# The block jumped to, and the game, game number and block it was picked from
+	state = {'from': None, 'target': None}
+
+	def policy(game, tick):
+		touches = 1 if fire_every and tick % fire_every == 0 else 0
+		if game.game_over or game.count == -1:
+			return (0.0, 0.0), touches
+
+		pos = game.player.position
+		current = getattr(game, 'current_block', None) if game.jumped else None
+		origin = (game, game.games, current)
+		if state['from'] != origin or state['target'] not in game.blocks:
+			state['from'] = origin
+			state['target'] = _target(game, current)
+		target = state['target']
+		if target is None:
+			return (0.0, 0.0), touches
+		tilt = max(-1.0, min(1.0, (target.position.x - pos.x)/physics.MAX_SPEED))
+		return (tilt, 0.0), touches
+	return policy
+
+
+# The block to jump to from `current` (None: from the ground)
+def _target(game, current):
+	# Standing on the ground is standing on a block at world height 0 (landing puts the player 32 points above the block's centre, as high as the ground)
+	if current is not None:
+		x, y = current.position.x, current.position.y
+	else:
+		x, y = game.player.position.x, 0.0
+	above = sorted((block for block in game.blocks if block is not current and block.position.y > y), key=lambda block: block.position.y)
+	for block in above:
+		if game.reach.reachable(block.position.x - x, block.position.y - y):
+			return block
+	return above[0] if above else None
+
+
+# Policies by name, for running bots in other processes (see farm.py): 'idle', 'climber' or 'climber/N' for a climber that fires every N frames
+def by_name(name):
+	if name == 'idle':
+		return idle
+	kind, _, fire_every = name.partition('/')
+	if kind == 'climber':
+		return climber(int(fire_every) if fire_every else 0)
+	raise ValueError('unknown policy: %r' % name)
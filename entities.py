@@ -0,0 +1,276 @@
+# ---[ Struct-of-arrays entity store
+# Coins, clouds and monsters are kept in NumPy arrays grouped by kind instead of a flat list of sprite nodes. Every frame the whole store is moved, scrolled and culled with a handful of array operations, and only afterwards are the results written back to the sprite nodes.
+from __future__ import division
+
+import numpy as np
+
+from spatial import SpatialGrid
+
+# ---[ Entity kinds
+COIN = 0
+CLOUD = 1
+MONSTER = 2
+
+KINDS = (COIN, CLOUD, MONSTER)
+
+
+# The per-entity arrays of a group
+ARRAYS = ('x', 'y', 'vel', 'dir', 'destroyed', 'shown_x', 'shown_y', 'shown_xs', 'shown_ys', 'frame', 'cell')
+
+
+# ---[ A single kind of entity
+class EntityGroup(object):
+	def __init__(self, kind, capacity=16):
+		self.kind = kind
+		self.n = 0
+
+		# Sprite nodes, in the same order as the arrays below
+		self.nodes = []
+
+		self.x = np.zeros(capacity)
+		self.y = np.zeros(capacity)
+		self.vel = np.zeros(capacity)
+		self.dir = np.ones(capacity)
+		self.destroyed = np.zeros(capacity, dtype=bool)
+
+		# What was last written to each sprite: its position, scale and animation frame (NaN and -1 until the first write), so that only changes are written
+		self.shown_x = np.full(capacity, np.nan)
+		self.shown_y = np.full(capacity, np.nan)
+		self.shown_xs = np.full(capacity, np.nan)
+		self.shown_ys = np.full(capacity, np.nan)
+		self.frame = np.full(capacity, -1, dtype=np.int64)
+
+		# Broad phase: every entity is filed in a grid cell, whose key is kept in `cell` so that moved entities can be re-filed in one vectorised comparison
+		self.grid = SpatialGrid()
+		self.cell = np.zeros(capacity, dtype=np.int64)
+
+		# Half of the largest (unscaled) sprite size in the group, used as the query margin
+		self.half_w = 0
+		self.half_h = 0
+
+	def __len__(self):
+		return self.n
+
+	def __contains__(self, node):
+		return node in self.nodes
+
+	def _grow(self):
+		capacity = 2*len(self.x)
+		for name in ARRAYS:
+			old = getattr(self, name)
+			new = np.zeros(capacity, dtype=old.dtype)
+			new[:self.n] = old[:self.n]
+			setattr(self, name, new)
+
+	def add(self, node, x, y):
+		if self.n == len(self.x):
+			self._grow()
+		i = self.n
+		self.x[i] = x
+		self.y[i] = y
+		self.vel[i] = 0
+		self.dir[i] = 1
+		self.destroyed[i] = False
+		self.shown_x[i] = self.shown_y[i] = self.shown_xs[i] = self.shown_ys[i] = np.nan
+		self.frame[i] = -1
+		self.nodes.append(node)
+		self.n += 1
+
+		key = self.grid.key(x, y)
+		self.cell[i] = key
+		self.grid.insert_key(node, key)
+
+		size = getattr(node, 'size', None)
+		if size is not None:
+			self.half_w = max(self.half_w, size.w/2)
+			self.half_h = max(self.half_h, size.h/2)
+		return i
+
+	# Keep only the entities where `keep` is True. The order of the survivors is preserved, because the monster update depends on it. Returns the nodes that were dropped.
+	def compact(self, keep):
+		n = self.n
+		if keep.all():
+			return []
+		keep_list = keep.tolist()
+		dropped = []
+		for node, k, key in zip(self.nodes, keep_list, self.cell[:n].tolist()):
+			if not k:
+				dropped.append(node)
+				self.grid.remove_key(node, key)
+		self.nodes = [node for node, k in zip(self.nodes, keep_list) if k]
+		m = len(self.nodes)
+		for name in ARRAYS:
+			arr = getattr(self, name)
+			arr[:m] = arr[:n][keep]
+		self.n = m
+		return dropped
+
+	def remove(self, node):
+		keep = np.ones(self.n, dtype=bool)
+		keep[self.nodes.index(node)] = False
+		self.compact(keep)
+
+	def clear(self):
+		self.nodes = []
+		self.n = 0
+		self.grid.clear()
+
+	# Re-file the entities whose position moved them into a different grid cell. Only those few need any Python-level work.
+	def reindex(self):
+		n = self.n
+		if not n:
+			return
+		keys = self.grid.keys(self.x[:n], self.y[:n])
+		old = self.cell[:n]
+		changed = np.flatnonzero(keys != old)
+		if changed.size:
+			nodes = self.nodes
+			move_key = self.grid.move_key
+			for i, a, b in zip(changed.tolist(), old[changed].tolist(), keys[changed].tolist()):
+				move_key(nodes[i], a, b)
+			self.cell[:n] = keys
+
+	# The rectangle (x, y, w, h) covered by the sprite of `node` as the arrays have it. Within a tick the arrays are ahead of the node, whose position and scale are only written when the sprite writes are flushed at the end of the tick
+	def rect(self, node):
+		i = self.nodes.index(node)
+		size = node.size
+		ax, ay = node.anchor_point
+		x_scale = self.shown_xs[i]
+		y_scale = self.shown_ys[i]
+		w = size.w*abs(node.x_scale if np.isnan(x_scale) else x_scale)
+		h = size.h*abs(node.y_scale if np.isnan(y_scale) else y_scale)
+		return (self.x[i] - ax*w, self.y[i] - ay*h, w, h)
+
+	# Broad phase query: the entities that may overlap the rectangle (x0, y0)-(x1, y1). `scale` is the current sprite scale of the group (monsters grow with the speed of the game).
+	def near(self, x0, y0, x1, y1, scale=1):
+		scale = abs(scale)
+		return self.grid.query(x0, y0, x1, y1, self.half_w*scale, self.half_h*scale)
+
+
+# ---[ The store
+class EntityStore(object):
+	def __init__(self, rng=None):
+		# Random numbers come from `rng`, which can be the np.random module itself or a seeded np.random.RandomState
+		self.rng = rng if rng is not None else np.random
+		self.groups = [EntityGroup(kind) for kind in KINDS]
+		self.coins, self.clouds, self.monsters = self.groups
+
+	def __len__(self):
+		return sum(g.n for g in self.groups)
+
+	def __iter__(self):
+		for g in self.groups:
+			for node in list(g.nodes):
+				yield node
+
+	def __contains__(self, node):
+		return any(node in g.nodes for g in self.groups)
+
+	def add(self, kind, node):
+		pos = node.position
+		return self.groups[kind].add(node, pos.x, pos.y)
+
+	def remove(self, node):
+		for g in self.groups:
+			if node in g.nodes:
+				g.remove(node)
+				return
+
+	def clear(self):
+		for g in self.groups:
+			g.clear()
+
+	# Advance every entity by one frame. Positions are in world coordinates, so scrolling the camera does not touch the store at all.
+	#   width     - width of the scene, which sets the speed range of every kind
+	#   bottom    - world y of the bottom of the screen; entities below it are culled
+	#   speed     - current game speed (monsters move faster and grow with it)
+	#   vel_scale - direction shared by all monsters at the start of the frame
+	# Returns the new shared monster direction and the list of nodes that left the screen (already dropped from the store).
+	def update(self, width, bottom, speed, vel_scale):
+		rng = self.rng
+		removed = []
+
+		# Coins fall with a velocity chosen for a fall duration of between 2 and 4 seconds
+		g = self.coins
+		n = g.n
+		if n:
+			y = g.y[:n]
+			keep = y >= bottom
+			g.vel[:n] = rng.uniform(width/(2.0*60), width/(4.0*60), n)
+			y -= g.vel[:n]
+			removed += g.compact(keep)
+			g.reindex()
+
+		# Clouds drift to the right and disappear past the right-hand edge
+		g = self.clouds
+		n = g.n
+		if n:
+			y = g.y[:n]
+			keep = y >= bottom
+			g.vel[:n] = rng.uniform(width/(25*60), width/(40*60), n)
+			x = g.x[:n]
+			x += g.vel[:n]
+			keep &= x <= width + 30
+			removed += g.compact(keep)
+			g.reindex()
+
+		# Monsters move left and right. All monsters share one direction: the monster that last touched an edge (in list order) decides it for itself and for every monster after it.
+		g = self.monsters
+		n = g.n
+		if n:
+			y = g.y[:n]
+			keep = y >= bottom
+			g.vel[:n] = rng.uniform(width/(5*60), width/(10*60), n)
+			x = g.x[:n]
+			flip = np.where(x > width - 40, -1, np.where(x < 40, 1, 0))
+			last = np.maximum.accumulate(np.where(flip != 0, np.arange(n), -1))
+			scale = np.where(last >= 0, flip[np.maximum(last, 0)], vel_scale)
+			x += g.vel[:n]*speed*scale
+			g.dir[:n] = scale
+			vel_scale = int(scale[-1])
+			removed += g.compact(keep)
+			g.reindex()
+
+		return vel_scale, removed
+
+	# Write the simulated state to the sprite nodes through `sprites` (a sprite_sync.SpriteSync). The changes are found with array comparisons against what was written before, so only the changed properties are queued. Monsters also get their facing, size and walking texture, from monster_texture(enemy_type, frame).
+	def sync(self, speed, monster_texture, sprites):
+		write = sprites.write
+		for g in self.groups:
+			n = g.n
+			if not n:
+				continue
+			nodes = g.nodes
+			x = g.x[:n]
+			y = g.y[:n]
+			moved = np.flatnonzero((x != g.shown_x[:n]) | (y != g.shown_y[:n]))
+			for i, xi, yi in zip(moved.tolist(), x[moved].tolist(), y[moved].tolist()):
+				write(nodes[i], 'position', (xi, yi))
+			g.shown_x[:n] = x
+			g.shown_y[:n] = y
+			requested = n
+			written = len(moved)
+
+			if g.kind == MONSTER:
+				requested += 3*n
+				x_scale = -g.dir[:n]*speed
+				changed = np.flatnonzero(x_scale != g.shown_xs[:n])
+				for i, value in zip(changed.tolist(), x_scale[changed].tolist()):
+					write(nodes[i], 'x_scale', value)
+				written += len(changed)
+				g.shown_xs[:n] = x_scale
+
+				changed = np.flatnonzero(g.shown_ys[:n] != speed)
+				for i in changed.tolist():
+					write(nodes[i], 'y_scale', speed)
+				written += len(changed)
+				g.shown_ys[:n] = speed
+
+				frames = np.trunc(x/20).astype(np.int64) % 2
+				changed = np.flatnonzero(frames != g.frame[:n])
+				for i, frame in zip(changed.tolist(), frames[changed].tolist()):
+					write(nodes[i], 'texture', monster_texture(nodes[i].enemy_type, frame))
+				written += len(changed)
+				g.frame[:n] = frames
+
+			sprites.skip(requested - written)
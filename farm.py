@@ -0,0 +1,256 @@
+# ---[ Run farm
+# Plays many headless game sessions in parallel, spread over a pool of worker processes (one per core by default). Every session is a 'cell' of a parameter sweep: a seed, a bot policy (see bots.by_name) and the difficulty of the game (Game.speed_cap, Game.speed_step and Game.item_chance). A session ends when the player dies or after max_ticks frames.
+#
+# Each finished session is summarised in one line of JSON (score, height, cause of death, ticks survived and frame-time statistics) that is appended to the results file as soon as it arrives. Sessions share nothing, so the farm scales with the number of cores. When a sweep is interrupted, running it again with the same results file only plays the cells that are not in the file yet.
+#
+#   python farm.py --runs 200 --speed-cap 3 4 --out runs.jsonl
+#   python farm.py --runs 200 --speed-cap 3 4 --out runs.jsonl     (resumes, or just prints the summary if everything is done)
+#   python farm.py --runs 200 --db scores.db                        (also keeps every run in the score store, see scores.py)
+#   python farm.py --runs 200 --telemetry events/                   (also writes the events of every run, see telemetry.py)
+from __future__ import division, print_function
+
+import os
+os.environ.setdefault('DOODLE_HEADLESS', '1')
+
+import argparse
+import functools
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+import zlib
+
+import numpy as np
+
+# The parameters of a cell and their defaults (the values hard-coded in the original game)
+PARAMS = (
+	('seed', 0),
+	('policy', 'climber'),
+	('speed_cap', 3),
+	('speed_step', 0.01),
+	('item_chance', 0.01),
+	('max_ticks', 36000),		# 10 minutes of game time
+)
+FLOAT_PARAMS = ('speed_cap', 'speed_step', 'item_chance')
+
+
+# ---[ Cells
+def cell(**params):
+	unknown = set(params) - set(name for name, default in PARAMS)
+	if unknown:
+		raise ValueError('unknown parameters: %s' % ', '.join(sorted(unknown)))
+	result = dict(PARAMS)
+	result.update(params)
+	# Normalise the types, so that e.g. speed_cap=3 and speed_cap=3.0 are the same cell
+	for name, default in PARAMS:
+		result[name] = float(result[name]) if name in FLOAT_PARAMS else type(default)(result[name])
+	return result
+
+
+# A string that identifies the cell, used to recognise finished runs when resuming
+def cell_key(c):
+	return ' '.join('%s=%s' % (name, c[name]) for name, default in PARAMS)
+
+
+# Every combination of the given values
+def sweep(seeds, policies=('climber',), speed_caps=(3,), speed_steps=(0.01,), item_chances=(0.01,), max_ticks=36000):
+	return [cell(seed=seed, policy=policy, speed_cap=cap, speed_step=step, item_chance=chance, max_ticks=max_ticks)
+		for policy, cap, step, chance, seed in itertools.product(policies, speed_caps, speed_steps, item_chances, seeds)]
+
+
+# ---[ Playing one cell (runs in a worker process)
+# With `events`, the events of the session (see telemetry.py) are returned with the summary, as an array under 'events'
+def play(c, events=False):
+	import bots
+	import telemetry
+	from Game import Game
+	from simulation import Simulation
+
+	game = Game()
+	game.speed_cap = c['speed_cap']
+	game.speed_step = c['speed_step']
+	game.item_chance = c['item_chance']
+	log = None
+	if events:
+		log = telemetry.EventLog()
+		game.events = log.session(zlib.crc32(cell_key(c).encode()))
+	sim = Simulation(game=game, seed=c['seed'])
+	policy = bots.by_name(c['policy'])
+
+	# The time of every frame, preallocated so that measuring does not allocate
+	times = np.empty(c['max_ticks'])
+	clock = time.perf_counter
+	ticks = 0
+	while ticks < c['max_ticks'] and not game.game_over:
+		tilt, touches = policy(game, ticks)
+		start = clock()
+		sim.step(tilt, touches)
+		times[ticks] = clock() - start
+		ticks += 1
+
+	times = times[:ticks]*1e6
+	summary = dict(c)
+	summary.update({
+		'key': cell_key(c),
+		'score': game.score,
+		'height': round(game.camera_y, 3),
+		'cause': game.death_cause if game.game_over else 'alive',
+		'ticks': ticks,
+		'coins': game.coins_collected,
+		'landings': game.landings,
+		'speed': game.speed,
+		'frame_us': {
+			'mean': round(float(times.mean()), 2) if ticks else 0,
+			'p50': round(float(np.percentile(times, 50)), 2) if ticks else 0,
+			'p99': round(float(np.percentile(times, 99)), 2) if ticks else 0,
+			'max': round(float(times.max()), 2) if ticks else 0,
+		},
+	})
+	if log is not None:
+		# A run that reached max_ticks is still alive: report it, or the survival curves of the sweep would only count the runs that died
+		game.end_events()
+		game.events.flush()
+		summary['events'] = log.rows()
+	return summary
+
+
+# ---[ Results file
+# Summaries already in the results file, by cell key. A line cut short by an interruption is ignored (that cell is simply played again).
+def load_results(path):
+	results = {}
+	if path is None or not os.path.exists(path):
+		return results
+	with open(path) as f:
+		for line in f:
+			try:
+				summary = json.loads(line)
+			except ValueError:
+				continue
+			results[summary['key']] = summary
+	return results
+
+
+def _open_for_append(path):
+	f = open(path, 'a+')
+	# Start on a fresh line if the last write was interrupted halfway
+	if f.tell():
+		f.seek(f.tell() - 1)
+		if f.read(1) != '\n':
+			f.write('\n')
+	return f
+
+
+# ---[ Running a sweep
+# Play every cell that has no result in `path` yet, on `processes` worker processes (default: one per core; 1 plays in this process). Yields the summaries as they arrive, in completion order, after appending each to `path`. With `telemetry_to`, the events of every session are written to that directory, in chunks gathered from all the sessions.
+def run(cells, path=None, processes=None, telemetry_to=None):
+	done = load_results(path)
+	todo = [c for c in cells if cell_key(c) not in done]
+	if not todo:
+		return
+
+	out = _open_for_append(path) if path else None
+	pool = None
+	writer = None
+	target = play
+	if telemetry_to:
+		import telemetry
+		writer = telemetry.TelemetryWriter(telemetry_to)
+		target = functools.partial(play, events=True)
+	try:
+		if processes == 1:
+			results = (target(c) for c in todo)
+		else:
+			pool = multiprocessing.Pool(processes)
+			# Sessions take long enough that handing them out one by one balances the workers best
+			results = pool.imap_unordered(target, todo, chunksize=1)
+		for summary in results:
+			events = summary.pop('events', None)
+			if writer is not None:
+				writer.put(None, events, len(events))
+			if out is not None:
+				out.write(json.dumps(summary, sort_keys=True) + '\n')
+				out.flush()
+			yield summary
+	finally:
+		if pool is not None:
+			pool.terminate()
+			pool.join()
+		if out is not None:
+			out.close()
+		if writer is not None:
+			writer.close()
+
+
+# Aggregate summaries per parameter combination (everything but the seed): number of runs, mean score, height and ticks, and the causes of death
+def aggregate(summaries):
+	groups = {}
+	for s in summaries:
+		group = tuple((name, s[name]) for name, default in PARAMS if name != 'seed')
+		groups.setdefault(group, []).append(s)
+
+	rows = []
+	for group in sorted(groups):
+		runs = groups[group]
+		causes = {}
+		for s in runs:
+			causes[s['cause']] = causes.get(s['cause'], 0) + 1
+		row = dict(group)
+		row.update({
+			'runs': len(runs),
+			'score': np.mean([s['score'] for s in runs]),
+			'height': np.mean([s['height'] for s in runs]),
+			'ticks': np.mean([s['ticks'] for s in runs]),
+			'causes': causes,
+		})
+		rows.append(row)
+	return rows
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Play many headless games in parallel')
+	parser.add_argument('--runs', type=int, default=100, help='seeds per parameter combination')
+	parser.add_argument('--first-seed', type=int, default=0)
+	parser.add_argument('--policy', nargs='+', default=['climber'], help="bot policies ('idle', 'climber', 'climber/N')")
+	parser.add_argument('--speed-cap', type=float, nargs='+', default=[3])
+	parser.add_argument('--speed-step', type=float, nargs='+', default=[0.01])
+	parser.add_argument('--item-chance', type=float, nargs='+', default=[0.01])
+	parser.add_argument('--max-ticks', type=int, default=36000)
+	parser.add_argument('--processes', type=int, default=None, help='worker processes (default: one per core)')
+	parser.add_argument('--out', default='runs.jsonl', help='results file (JSON lines); finished cells in it are not played again')
+	parser.add_argument('--db', default=None, help='also add every run played to this score database (see scores.py)')
+	parser.add_argument('--telemetry', default=None, help='also write the events of every run played to this directory (see telemetry.py)')
+	args = parser.parse_args(argv)
+
+	cells = sweep(range(args.first_seed, args.first_seed + args.runs), args.policy, args.speed_cap, args.speed_step, args.item_chance, args.max_ticks)
+	done = load_results(args.out)
+	remaining = sum(1 for c in cells if cell_key(c) not in done)
+	print('%d cells, %d already done' % (len(cells), len(cells) - remaining))
+
+	store = None
+	if args.db:
+		from scores import ScoreStore
+		store = ScoreStore(args.db)
+
+	start = time.time()
+	try:
+		for i, summary in enumerate(run(cells, args.out, args.processes, args.telemetry)):
+			if store is not None:
+				store.add(summary)
+			print('[%d/%d] %s: score %d, %s after %d ticks' % (i + 1, remaining, summary['key'], summary['score'], summary['cause'], summary['ticks']))
+	finally:
+		if store is not None:
+			store.close()
+	if remaining:
+		print('%d runs in %.1f s' % (remaining, time.time() - start))
+
+	results = load_results(args.out)
+	print('%-12s %6s %6s %6s %6s %5s %9s %9s %9s  %s' % ('policy', 'cap', 'step', 'items', 'ticks', 'runs', 'score', 'height', 'survived', 'causes'))
+	for row in aggregate(results[cell_key(c)] for c in cells):
+		causes = ', '.join('%s %d' % item for item in sorted(row['causes'].items()))
+		print('%-12s %6g %6g %6g %6d %5d %9.1f %9.1f %9.1f  %s' % (row['policy'], row['speed_cap'], row['speed_step'], row['item_chance'], row['max_ticks'], row['runs'], row['score'], row['height'], row['ticks'], causes))
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,488 @@
+# ---[ Headless stand-in for Pythonista's `scene` module
+# Only the parts of the API that the game uses are implemented. Nodes keep their geometry in plain Python floats, actions are advanced by an explicit time step instead of the wall clock, and nothing is ever drawn. This lets Game run unrendered on any machine, as fast as the CPU allows.
+from __future__ import division
+
+import math
+
+# ---[ Constants
+DEFAULT_ORIENTATION = 0
+PORTRAIT = 1
+LANDSCAPE = 2
+
+TIMING_LINEAR = 0
+TIMING_EASE_IN = 1
+TIMING_EASE_OUT = 2
+TIMING_EASE_IN_OUT = 3
+TIMING_SINODIAL = 4
+
+# Default size of the headless 'screen' (portrait iPhone, in points)
+SCREEN_SIZE = (375, 667)
+
+# Sizes (in points) of the built-in images used by the game. Unknown images fall back to DEFAULT_TEXTURE_SIZE.
+TEXTURE_SIZES = {
+	'plf:AlienPink_front': (66, 92),
+	'plf:AlienPink_jump': (67, 93),
+	'plf:AlienPink_duck': (69, 71),
+	'plf:AlienPink_hit': (69, 92),
+	'plf:Ground_GrassMid': (70, 70),
+	'plf:Ground_GrassHalf_mid': (70, 70),
+	'plf:Item_CoinGold': (70, 70),
+	'emj:Cloud': (64, 64),
+	'spc:LaserBlue9': (13, 37),
+}
+DEFAULT_TEXTURE_SIZE = (60, 40)
+
+
+# ---[ Geometry
+class Point(object):
+	__slots__ = ('x', 'y')
+
+	def __init__(self, x=0.0, y=0.0):
+		self.x = x
+		self.y = y
+
+	def __iter__(self):
+		yield self.x
+		yield self.y
+
+	def __len__(self):
+		return 2
+
+	def __getitem__(self, i):
+		return (self.x, self.y)[i]
+
+	def __add__(self, other):
+		ox, oy = other
+		return Point(self.x + ox, self.y + oy)
+
+	def __sub__(self, other):
+		ox, oy = other
+		return Point(self.x - ox, self.y - oy)
+
+	def __eq__(self, other):
+		try:
+			ox, oy = other
+		except (TypeError, ValueError):
+			return False
+		return self.x == ox and self.y == oy
+
+	def __ne__(self, other):
+		return not self == other
+
+	def __repr__(self):
+		return 'Point(x=%s, y=%s)' % (self.x, self.y)
+
+
+class Size(object):
+	__slots__ = ('w', 'h')
+
+	def __init__(self, w=0.0, h=0.0):
+		self.w = w
+		self.h = h
+
+	def __iter__(self):
+		yield self.w
+		yield self.h
+
+	def __getitem__(self, i):
+		return (self.w, self.h)[i]
+
+	def __repr__(self):
+		return 'Size(w=%s, h=%s)' % (self.w, self.h)
+
+
+class Vector3(object):
+	__slots__ = ('x', 'y', 'z')
+
+	def __init__(self, x=0.0, y=0.0, z=0.0):
+		self.x = x
+		self.y = y
+		self.z = z
+
+	def __iter__(self):
+		yield self.x
+		yield self.y
+		yield self.z
+
+	def __repr__(self):
+		return 'Vector3(x=%s, y=%s, z=%s)' % (self.x, self.y, self.z)
+
+
+class Rect(object):
+	__slots__ = ('x', 'y', 'w', 'h')
+
+	def __init__(self, x=0.0, y=0.0, w=0.0, h=0.0):
+		self.x = x
+		self.y = y
+		self.w = w
+		self.h = h
+
+	def __iter__(self):
+		yield self.x
+		yield self.y
+		yield self.w
+		yield self.h
+
+	def __contains__(self, point):
+		px, py = point
+		return self.x <= px < self.x + self.w and self.y <= py < self.y + self.h
+
+	def intersects(self, other):
+		return (self.x < other.x + other.w and other.x < self.x + self.w and self.y < other.y + other.h and other.y < self.y + self.h)
+
+	@property
+	def min_x(self):
+		return self.x
+
+	@property
+	def max_x(self):
+		return self.x + self.w
+
+	@property
+	def min_y(self):
+		return self.y
+
+	@property
+	def max_y(self):
+		return self.y + self.h
+
+	def __repr__(self):
+		return 'Rect(x=%s, y=%s, w=%s, h=%s)' % (self.x, self.y, self.w, self.h)
+
+
+# ---[ Textures
+class Texture(object):
+	def __init__(self, name):
+		self.name = name
+		w, h = TEXTURE_SIZES.get(name, DEFAULT_TEXTURE_SIZE)
+		self.size = Size(w, h)
+
+	def __repr__(self):
+		return 'Texture(%r)' % self.name
+
+
+# ---[ Input
+_gravity = Vector3(0.0, 0.0, -1.0)
+
+def gravity():
+	return Vector3(_gravity.x, _gravity.y, _gravity.z)
+
+# Headless only: set the value returned by gravity(), i.e. the current tilt of the 'device'
+def set_gravity(x, y, z=-1.0):
+	_gravity.x = x
+	_gravity.y = y
+	_gravity.z = z
+
+
+class Touch(object):
+	def __init__(self, x=0.0, y=0.0, touch_id=0):
+		self.location = Point(x, y)
+		self.prev_location = Point(x, y)
+		self.touch_id = touch_id
+
+
+# ---[ Actions
+# An Action is only a description; every run_action() call creates a fresh runner that keeps the elapsed time, so the same Action can be reused on several nodes like in Pythonista.
+def _timing(mode, t):
+	if mode == TIMING_LINEAR:
+		return t
+	if mode == TIMING_EASE_IN:
+		return t*t
+	if mode == TIMING_EASE_OUT:
+		return t*(2 - t)
+	if mode == TIMING_EASE_IN_OUT:
+		return t*t*(3 - 2*t)
+	# TIMING_SINODIAL
+	return 0.5 - 0.5*math.cos(math.pi*t)
+
+
+class Action(object):
+	def __init__(self, kind, duration=0.0, timing_mode=TIMING_LINEAR, **params):
+		self.kind = kind
+		self.duration = duration
+		self.timing_mode = timing_mode
+		self.params = params
+
+	@staticmethod
+	def move_by(dx, dy, duration=0.5, timing_mode=TIMING_LINEAR):
+		return Action('move_by', duration, timing_mode, dx=dx, dy=dy)
+
+	@staticmethod
+	def move_to(x, y, duration=0.5, timing_mode=TIMING_LINEAR):
+		return Action('move_to', duration, timing_mode, x=x, y=y)
+
+	@staticmethod
+	def wait(duration):
+		return Action('wait', duration)
+
+	@staticmethod
+	def call(func):
+		return Action('call', func=func)
+
+	@staticmethod
+	def remove():
+		return Action('remove')
+
+	@staticmethod
+	def sequence(*actions):
+		if len(actions) == 1 and isinstance(actions[0], (list, tuple)):
+			actions = actions[0]
+		return Action('sequence', sum(a.duration for a in actions), actions=list(actions))
+
+	@staticmethod
+	def group(*actions):
+		if len(actions) == 1 and isinstance(actions[0], (list, tuple)):
+			actions = actions[0]
+		return Action('group', max([a.duration for a in actions] or [0]), actions=list(actions))
+
+
+class _ActionRun(object):
+	__slots__ = ('action', 'elapsed', 'progress', 'start', 'children', 'index')
+
+	def __init__(self, action):
+		self.action = action
+		self.elapsed = 0.0
+		self.progress = 0.0
+		self.start = None
+		self.index = 0
+		self.children = None
+
+	# Advance the runner by dt seconds. Returns the time left over once the action has finished, or None while it is still running.
+	def advance(self, node, dt):
+		a = self.action
+		kind = a.kind
+
+		if kind == 'sequence':
+			actions = a.params['actions']
+			while self.index < len(actions):
+				if self.children is None:
+					self.children = _ActionRun(actions[self.index])
+				left = self.children.advance(node, dt)
+				if left is None:
+					return None
+				dt = left
+				self.children = None
+				self.index += 1
+			return dt
+
+		if kind == 'group':
+			if self.children is None:
+				self.children = [_ActionRun(child) for child in a.params['actions']]
+			left_over = []
+			running = []
+			for child in self.children:
+				left = child.advance(node, dt)
+				if left is None:
+					running.append(child)
+				else:
+					left_over.append(left)
+			self.children = running
+			if running:
+				return None
+			return min(left_over) if left_over else dt
+
+		if kind == 'call':
+			a.params['func']()
+			return dt
+
+		if kind == 'remove':
+			node.remove_from_parent()
+			return dt
+
+		# Timed actions (move_by, move_to, wait)
+		if a.duration <= 0:
+			new_progress = 1.0
+			left = dt
+		else:
+			self.elapsed += dt
+			left = self.elapsed - a.duration
+			new_progress = min(1.0, self.elapsed/a.duration)
+
+		if kind == 'move_by':
+			f0 = _timing(a.timing_mode, self.progress)
+			f1 = _timing(a.timing_mode, new_progress)
+			node._x += a.params['dx']*(f1 - f0)
+			node._y += a.params['dy']*(f1 - f0)
+		elif kind == 'move_to':
+			if self.start is None:
+				self.start = (node._x, node._y)
+			f1 = _timing(a.timing_mode, new_progress)
+			node._x = self.start[0] + (a.params['x'] - self.start[0])*f1
+			node._y = self.start[1] + (a.params['y'] - self.start[1])*f1
+
+		self.progress = new_progress
+		if new_progress >= 1.0:
+			return max(0.0, left)
+		return None
+
+
+# ---[ Nodes
+class Node(object):
+	def __init__(self, position=(0, 0), z_position=0.0, scale=1.0, x_scale=None, y_scale=None, alpha=1.0, speed=1.0, parent=None):
+		self._x, self._y = position
+		self.z_position = z_position
+		self.x_scale = scale if x_scale is None else x_scale
+		self.y_scale = scale if y_scale is None else y_scale
+		self.alpha = alpha
+		self.speed = speed
+		self.rotation = 0.0
+		self.children = []
+		self.parent = None
+		self._actions = []
+		if parent is not None:
+			parent.add_child(self)
+
+	def _get_position(self):
+		# Like in Pythonista, a copy is returned, so `node.position.y = 1` has no effect on the node
+		return Point(self._x, self._y)
+
+	def _set_position(self, value):
+		self._x, self._y = value
+
+	position = property(_get_position, _set_position)
+
+	@property
+	def scene(self):
+		node = self
+		while node.parent is not None:
+			node = node.parent
+		return node if isinstance(node, Scene) else None
+
+	@property
+	def frame(self):
+		return Rect(self._x, self._y, 0, 0)
+
+	def add_child(self, node):
+		if node.parent is not None:
+			node.remove_from_parent()
+		node.parent = self
+		self.children.append(node)
+
+	def remove_from_parent(self):
+		parent = self.parent
+		if parent is not None:
+			parent.children.remove(self)
+			self.parent = None
+
+	def run_action(self, action, key=None):
+		if key is not None:
+			self.remove_action(key)
+		self._actions.append((key, _ActionRun(action)))
+
+	def remove_action(self, key):
+		self._actions = [(k, run) for k, run in self._actions if k != key]
+
+	def remove_all_actions(self):
+		self._actions = []
+
+	# Advance the actions of this node and all of its descendants. Nodes that are removed from the tree while this is running stop receiving time, the same as in a real scene.
+	def _advance_actions(self, dt):
+		if self._actions:
+			runs = self._actions
+			self._actions = []
+			still_running = []
+			for key, run in runs:
+				if run.advance(self, dt*self.speed) is None:
+					still_running.append((key, run))
+			# run_action() may have been called from inside a `call` action
+			self._actions = still_running + self._actions
+		if self.children:
+			for child in list(self.children):
+				if child.parent is self and (child._actions or child.children):
+					child._advance_actions(dt)
+
+
+class SpriteNode(Node):
+	def __init__(self, texture=None, position=(0, 0), z_position=0.0, scale=1.0, x_scale=None, y_scale=None, alpha=1.0, speed=1.0, parent=None, size=None, color='white', blend_mode=0):
+		Node.__init__(self, position=position, z_position=z_position, scale=scale, x_scale=x_scale, y_scale=y_scale, alpha=alpha, speed=speed, parent=parent)
+		if isinstance(texture, str):
+			texture = Texture(texture)
+		self.texture = texture
+		if size is None:
+			size = texture.size if texture is not None else Size(0, 0)
+		self.size = Size(*size)
+		self.anchor_point = Point(0.5, 0.5)
+		self.color = color
+		self.blend_mode = blend_mode
+
+	def _get_anchor_point(self):
+		return Point(self._ax, self._ay)
+
+	def _set_anchor_point(self, value):
+		self._ax, self._ay = value
+
+	anchor_point = property(_get_anchor_point, _set_anchor_point)
+
+	@property
+	def frame(self):
+		w = self.size.w*abs(self.x_scale)
+		h = self.size.h*abs(self.y_scale)
+		return Rect(self._x - self._ax*w, self._y - self._ay*h, w, h)
+
+
+class LabelNode(SpriteNode):
+	def __init__(self, text='', font=('Helvetica', 20), **kwargs):
+		SpriteNode.__init__(self, None, **kwargs)
+		self.font = font
+		self.text = text
+
+
+class Scene(Node):
+	def __init__(self):
+		Node.__init__(self)
+		self.size = Size(*SCREEN_SIZE)
+		self.background_color = 'black'
+		self.t = 0.0
+		self.dt = 0.0
+		self.touches = {}
+
+	@property
+	def bounds(self):
+		return Rect(0, 0, self.size.w, self.size.h)
+
+	# Overridden by the game
+	def setup(self):
+		pass
+
+	def update(self):
+		pass
+
+	def touch_began(self, touch):
+		pass
+
+	def touch_moved(self, touch):
+		pass
+
+	def touch_ended(self, touch):
+		pass
+
+	def stop(self):
+		pass
+
+	# Headless only: the equivalent of the view being presented on screen
+	def present(self, size=None):
+		if size is not None:
+			self.size = Size(*size)
+		self.setup()
+
+	# Headless only: advance the scene by one frame of dt seconds. The order matches the real renderer: update() first, then the actions of every node in the tree.
+	def advance(self, dt):
+		self.dt = dt
+		self.t += dt
+		self.update()
+		self._advance_actions(dt)
+
+
+# Present the scene and step it on a fixed 60 Hz clock for `ticks` frames (one simulated minute by default). With show_fps, the achieved headless frame rate is printed at the end.
+def run(scene, orientation=DEFAULT_ORIENTATION, frame_interval=1, anti_alias=False, show_fps=False, multi_touch=True, ticks=3600):
+	import time
+
+	dt = frame_interval/60
+	scene.present()
+	start = time.time()
+	for i in range(ticks):
+		scene.advance(dt)
+	elapsed = time.time() - start
+	if show_fps:
+		print('%d frames in %.3f s (%.0f fps)' % (ticks, elapsed, ticks/max(elapsed, 1e-9)))
+	return scene
@@ -0,0 +1,21 @@
+# ---[ Headless stand-in for Pythonista's `sound` module
+# Nothing is played. The number of requested effects is counted so that headless runs can still report how much audio the game asked for.
+
+effects_played = 0
+
+def play_effect(name, volume=1.0, pitch=1.0, pan=0.0, looping=False):
+	global effects_played
+	effects_played += 1
+	return None
+
+def load_effect(name):
+	return None
+
+def stop_effect(effect_id):
+	pass
+
+def stop_all_effects():
+	pass
+
+def set_volume(volume):
+	pass
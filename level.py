@@ -0,0 +1,181 @@
+# ---[ Procedural level stream
+# Generates the world in chunks of CHUNK_HEIGHT points, from the bottom up: the blocks (placed with the reachability envelope, see physics.Envelope) and the coins, clouds and monsters found in each slice of height. Everything comes from the stream's own random number generator, seeded once, so the same seed always produces the same world, however fast or slow it is climbed and whenever the chunks are generated.
+#
+# The stream is an iterator: next(stream) returns the next chunk. The game asks for a few chunks to be generated ahead of the camera with prefetch(), which only queues the stream: the chunks are generated on a background thread shared by all streams, outside the frame loop. take(top) hands out the chunks the camera has reached, which the game then only has to turn into sprites (see Game.read_level); only when the camera outran the background thread does take() generate a chunk itself. Chunks are always generated one after the other from the stream's own generator, by whichever thread gets there first, so the world is the same either way.
+from __future__ import division
+
+import collections
+import queue
+import random
+import threading
+
+import physics
+
+# Height of a chunk, and how many chunks are kept generated ahead of the one the camera reaches next
+CHUNK_HEIGHT = 512
+AHEAD = 2
+
+# Items are rolled once per ROW points of height. The game rolls them once per tick (Game.item_chance) and the player climbs about CLIMB points per tick on average, so this keeps about as many items on the way up as the classic game
+ROW = 32
+CLIMB = 1.5
+
+
+class Chunk(object):
+	__slots__ = ('index', 'y0', 'y1', 'blocks', 'coins', 'clouds', 'monsters')
+
+	def __init__(self, index, y0, y1):
+		self.index = index
+		self.y0 = y0
+		self.y1 = y1
+
+		# (x, y) in world coordinates; monsters are (x, y, enemy type)
+		self.blocks = []
+		self.coins = []
+		self.clouds = []
+		self.monsters = []
+
+
+# ---[ Background generation
+_requests = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _generate_ahead():
+	while True:
+		_requests.get()._fill()
+
+
+def _submit(stream):
+	global _worker
+	with _worker_lock:
+		if _worker is None:
+			_worker = threading.Thread(target=_generate_ahead, name='LevelStream')
+			_worker.daemon = True
+			_worker.start()
+	_requests.put(stream)
+
+
+# ---[ The stream
+class LevelStream(object):
+	def __init__(self, seed, width, monster_types, speed_cap=3, speed_step=0.01, item_chance=0.01, first_item=0, envelope=None):
+		self.seed = seed
+		self.width = width
+		self.monster_types = monster_types
+		self.speed_cap = speed_cap
+		self.speed_step = speed_step
+		self.row_chance = item_chance*ROW/CLIMB
+
+		# No items below this height (the first screen stays clear, as in the classic game before the first jump)
+		self.first_item = first_item
+		self.envelope = envelope if envelope is not None else physics.envelope()
+
+		self.rng = random.Random(seed)
+
+		# Where generation stands: the next chunk, the last block placed, and the game speed reached with it (it grows with every block, as in Game.spawn_blocks)
+		self.index = 0
+		self.last = None
+		self.speed = 1.0
+
+		# The next block, once placed (it may already be too high for the chunk being generated)
+		self.next_block = None
+
+		# Chunks generated but not taken yet, and how many to keep ready
+		self.ready = collections.deque()
+		self.ahead = AHEAD
+
+		# Generation is serialised by the lock (the background thread and take() may both generate). `queued` is True while the stream waits for the background thread
+		self._lock = threading.Lock()
+		self._queued = False
+
+	def __iter__(self):
+		return self
+
+	def __next__(self):
+		return self._generate()
+
+	def _generate(self):
+		rng = self.rng
+		w = self.width
+		chunk = Chunk(self.index, self.index*CHUNK_HEIGHT, (self.index + 1)*CHUNK_HEIGHT)
+		self.index += 1
+
+		# Blocks, each one within reach of the one before it. The first block that is too high is kept for the next chunk
+		while True:
+			if self.next_block is None:
+				self.next_block = self._place_block()
+			if self.next_block[1] >= chunk.y1:
+				break
+			chunk.blocks.append(self.next_block)
+			self.last = self.next_block
+			self.next_block = None
+			self.speed = min(self.speed_cap, self.speed + self.speed_step)
+
+		# Items: a coin (with a cloud) on some rows, and sometimes a monster, more often the faster the game is
+		for row in range(chunk.y0, chunk.y1, ROW):
+			if row < self.first_item or rng.random() >= self.row_chance:
+				continue
+			y = row + rng.uniform(0, ROW)
+			chunk.coins.append((rng.uniform(27, w - 27), y))
+			chunk.clouds.append((rng.uniform(-50, w - 100), y + rng.uniform(170, 570)))
+			if rng.random() < 0.09*self.speed:
+				enemy_type = self.monster_types[int(10*rng.random())]
+				chunk.monsters.append((rng.uniform(50, w - 50), y + rng.uniform(70, 370), enemy_type))
+		return chunk
+
+	# The same placement as Game.spawn_blocks
+	def _place_block(self):
+		rng = self.rng
+		w = self.width
+		if self.last is None:
+			return (rng.uniform(27, w - 27), rng.uniform(100, 200))
+		last_x, last_y = self.last
+		envelope = self.envelope
+		x = rng.uniform(27, w - 27)
+		y = rng.uniform(last_y + 50, last_y + min(220, envelope.max_height))
+		reach = envelope.distance(y - last_y)
+		if abs(x - last_x) > reach:
+			x = rng.uniform(max(27, last_x - reach), min(w - 27, last_x + reach))
+		return (x, y)
+
+	# Have the background thread generate chunks until `ahead` are waiting. Returns right away
+	def prefetch(self, ahead=AHEAD):
+		self.ahead = ahead
+		if len(self.ready) < ahead and not self._queued:
+			self._queued = True
+			_submit(self)
+
+	# Runs on the background thread (one chunk per hold of the lock, so take() never waits long)
+	def _fill(self):
+		self._queued = False
+		while True:
+			with self._lock:
+				if len(self.ready) >= self.ahead:
+					return
+				self.ready.append(self._generate())
+
+	# The chunks whose bottom is below the world height `top`, in order (generated now if they were not ready yet)
+	def take(self, top):
+		chunks = []
+		with self._lock:
+			while True:
+				if not self.ready:
+					if self.index*CHUNK_HEIGHT > top:
+						break
+					self.ready.append(self._generate())
+				if self.ready[0].y0 > top:
+					break
+				chunks.append(self.ready.popleft())
+		return chunks
+
+	# An independent stream in the same state (chunks are never changed once generated, so they are shared). The copy generates nothing until it is asked to
+	def copy(self):
+		other = object.__new__(LevelStream)
+		with self._lock:
+			other.__dict__.update(self.__dict__)
+			other.rng = random.Random()
+			other.rng.setstate(self.rng.getstate())
+			other.ready = collections.deque(self.ready)
+		other._lock = threading.Lock()
+		other._queued = False
+		return other
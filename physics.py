@@ -0,0 +1,179 @@
+# ---[ Player physics
+# The jump is a table of vertical displacements, one entry per tick: the player rises with a velocity that drops by `acc` every tick until it reaches zero, and then falls back along the mirrored path. The table is computed in closed form and shared (read-only) by every game with the same jump parameters; both the Game and the batched simulator (batch_env.py) use it.
+#
+# The reachability envelope (Envelope) is worked out from the same table: for every height difference between two blocks, how far apart they can be horizontally for the player to get from one to the other. Level generation checks blocks against it instead of playing the level.
+#
+# The game logic runs in fixed ticks of 1/TICK_RATE seconds. FixedStep turns the real time between two frames into a whole number of ticks, so the jump keeps its height and timing whatever the frame rate is.
+from __future__ import division
+
+import numpy as np
+
+JUMP_VELOCITY = 10
+JUMP_ACCELERATION = 45/200
+
+# Game logic ticks per second (the jump table has one entry per tick)
+TICK_RATE = 60
+
+# The fastest the player moves sideways, in points per tick (with the device fully tilted)
+MAX_SPEED = 35
+
+# Sizes involved in a landing: the player's hitbox, the block sprite, and the height of the player's feet above a block it stands on (see Game.check_jump)
+HITBOX = (40, 65)
+BLOCK_SIZE = (70, 70)
+BOTTOM = 32
+
+
+# ---[ Jump trajectory
+class Trajectory(object):
+	def __init__(self, vel, acc):
+		self.vel = vel
+		self.acc = acc
+
+		# The player rises while acc*i <= vel, i.e. for the ticks i = 0 .. rise-1. The bound is checked with the same float arithmetic a step-by-step loop would use.
+		rise = int(np.floor(vel/acc)) + 1
+		while acc*rise <= vel:
+			rise += 1
+		while rise > 0 and acc*(rise - 1) > vel:
+			rise -= 1
+
+		# Standing still on the first tick, then rising with a linearly decreasing velocity, then a tick at the apex and the mirrored fall
+		up = np.zeros(rise + 1)
+		up[1:rise] = vel - acc*np.arange(rise - 1)
+		table = np.concatenate((up, -up[::-1]))[:-1]
+		table.flags.writeable = False
+		self.table = table
+		self.period = len(table)
+
+		# The same table as plain floats, for code that reads one entry per tick (indexing a NumPy array returns a NumPy scalar, which is slower to compute with)
+		self.steps = tuple(table.tolist())
+
+		# Height above the take-off point after k ticks of the jump (k = 0 .. period)
+		heights = np.concatenate(([0.0], np.cumsum(table)))
+		heights.flags.writeable = False
+		self.heights = heights
+
+		# Highest point of the jump above the take-off point
+		self.apex = heights[1:self.period//2 + 1].max() if self.period else 0.0
+
+	# Displacement on the next tick after tick `count`, scaled by the fraction `alpha` of that tick (used to draw the player in between two ticks)
+	def offset(self, count, alpha):
+		return alpha*self.steps[(count + 1) % self.period]
+
+
+_trajectories = {}
+
+
+# The trajectory for a set of jump parameters, computed once and then shared
+def trajectory(vel=JUMP_VELOCITY, acc=JUMP_ACCELERATION):
+	key = (vel, acc)
+	result = _trajectories.get(key)
+	if result is None:
+		result = _trajectories[key] = Trajectory(vel, acc)
+	return result
+
+
+# Define a jumping array which determines the vertical positions of the player during the jump
+def jump_table(vel=JUMP_VELOCITY, acc=JUMP_ACCELERATION):
+	return trajectory(vel, acc).table
+
+
+# The highest point of a jump that starts at `bottom`
+def max_jump(jump, bottom):
+	return bottom + np.sum(jump[0:len(jump)//2])
+
+
+# ---[ Reachability envelope
+# check_jump() lands the player on a block when, on a falling tick, its feet are less than `vel` away from the top of the block (rounded to whole points) and its hitbox overlaps the block. The player takes off from the block it stands on, so whether the next block can be reached only depends on the height difference dy and the horizontal distance dx between the two blocks.
+#
+# ticks[r] is the last tick of the jump on which a block r points higher (rounded, r = lo .. hi) can still be landed on, 0 if it cannot be landed on at all. By then the player can have moved reach[r] = max_speed*(ticks[r] - 1) points sideways: it may have to stand still on the first tick to stay on its block (check_fall_off looks there), and it may start from anywhere on the block it landed on. A block within reach[r] horizontally can therefore always be reached, whatever the player did before; it is a safe bound rather than the farthest jump a perfect player can make.
+class Envelope(object):
+	def __init__(self, traj, max_speed=MAX_SPEED, hitbox=HITBOX, block_size=BLOCK_SIZE, bottom=BOTTOM):
+		self.max_speed = max_speed
+
+		# Heights of the player (above its take-off point) on ticks j = 1 .. period, and whether it is falling on them
+		j = np.arange(1, traj.period + 1)
+		h = traj.heights[j]
+		falling = traj.table[j - 1] < 0
+
+		# Every whole height difference that could possibly be landed on
+		self.lo = -int(np.ceil(traj.vel))
+		self.hi = int(np.ceil(traj.apex + traj.vel))
+		r = np.arange(self.lo, self.hi + 1)[:, None]
+
+		# The conditions of check_jump, with the block anywhere within half a point of r (so that rounding never makes a block unreachable)
+		half_h = block_size[1]/2
+		land = falling & (np.abs(h - r) < traj.vel) & (bottom + h < r - 0.5 + half_h) & (r + 0.5 - half_h < bottom + h + hitbox[1])
+		last = np.where(land.any(axis=1), traj.period - np.argmax(land[:, ::-1], axis=1), 0)
+
+		ticks = last.astype(np.int64)
+		ticks.flags.writeable = False
+		self.ticks = ticks
+		reach = np.where(ticks > 0, max_speed*(ticks - 1.0), -1.0)
+		reach.flags.writeable = False
+		self.reach = reach
+
+		# The same table as plain floats, for checking one block at a time
+		self._reach = tuple(reach.tolist())
+
+		# The highest block that can be reached (every height from 0 up to it can)
+		ok = reach[-self.lo:] >= 0
+		self.max_height = self.hi if ok.all() else int(np.argmin(ok)) - 1
+
+	# How far sideways a block dy points higher can be and still be reached (-1 if it cannot be reached at all). O(1): one table lookup
+	def distance(self, dy):
+		i = int(round(dy)) - self.lo
+		if i < 0 or i >= len(self._reach):
+			return -1.0
+		return self._reach[i]
+
+	def reachable(self, dx, dy):
+		return abs(dx) <= self.distance(dy)
+
+	# The same check for whole arrays of block pairs at once
+	def check(self, dx, dy):
+		i = np.rint(dy).astype(np.int64) - self.lo
+		inside = (i >= 0) & (i < len(self.reach))
+		return inside & (np.abs(dx) <= self.reach[np.clip(i, 0, len(self.reach) - 1)])
+
+	# Check whole levels: x and y are the block positions in the order they are climbed (one level per row for 2D arrays). Returns, for every block after the first, whether it can be reached from the one before it
+	def check_level(self, x, y):
+		x = np.asarray(x, dtype=float)
+		y = np.asarray(y, dtype=float)
+		return self.check(np.diff(x, axis=-1), np.diff(y, axis=-1))
+
+
+_envelopes = {}
+
+
+# The reachability envelope of a jump, computed once and then shared
+def envelope(vel=JUMP_VELOCITY, acc=JUMP_ACCELERATION, max_speed=MAX_SPEED):
+	key = (vel, acc, max_speed)
+	result = _envelopes.get(key)
+	if result is None:
+		result = _envelopes[key] = Envelope(trajectory(vel, acc), max_speed)
+	return result
+
+
+# ---[ Fixed time step
+# Converts the time between two frames into whole ticks. What is left over is carried into the next frame; `alpha` is the part of the next tick that has already passed (0 <= alpha < 1). After a long stall (the app was in the background, a breakpoint...) at most max_ticks are run, instead of trying to catch up all at once.
+class FixedStep(object):
+	def __init__(self, rate=TICK_RATE, max_ticks=8):
+		self.rate = rate
+		self.max_ticks = max_ticks
+		self.acc = 0.0
+		self.alpha = 0.0
+
+	def ticks(self, dt):
+		self.acc += dt*self.rate
+		# The small tolerance keeps a frame of exactly 1/rate seconds at exactly one tick despite rounding
+		n = int(self.acc + 1e-6)
+		self.acc = max(0.0, self.acc - n)
+		if n > self.max_ticks:
+			n = self.max_ticks
+			self.acc = 0.0
+		self.alpha = self.acc if self.acc > 1e-6 else 0.0
+		return n
+
+	def reset(self):
+		self.acc = 0.0
+		self.alpha = 0.0
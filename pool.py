@@ -0,0 +1,59 @@
+# ---[ Sprite node pools
+# Creating and throwing away sprite nodes for every coin, cloud, monster, block and laser causes a steady stream of allocations (and garbage collection pauses) during long sessions. A pool keeps released nodes around and hands them out again, after resetting everything a previous life may have changed (alpha, scale, position and whatever the node's own reset() method restores, e.g. a Monster's texture and `destroyed` flag).
+
+
+class NodePool(object):
+	def __init__(self, factory, capacity=32):
+		# `factory` creates a new node when the pool is empty, e.g. the Coin class
+		self.factory = factory
+
+		# The largest number of free nodes kept for reuse. Nodes released while the pool is full are simply dropped.
+		self.capacity = capacity
+		self.free = []
+
+		# Counters
+		self.hits = 0			# acquire() calls served from the pool
+		self.misses = 0			# acquire() calls that had to create a node
+		self.discarded = 0		# released nodes dropped because the pool was full
+		self.in_use = 0
+		self.high_water = 0		# the largest number of nodes in use at the same time
+
+	def acquire(self, parent=None, position=(0, 0), z_position=0):
+		if self.free:
+			node = self.free.pop()
+			node.alpha = 1.0
+			node.x_scale = 1.0
+			node.y_scale = 1.0
+			reset = getattr(node, 'reset', None)
+			if reset is not None:
+				reset()
+			self.hits += 1
+		else:
+			node = self.factory()
+			self.misses += 1
+
+		node.position = position
+		node.z_position = z_position
+		if parent is not None:
+			parent.add_child(node)
+
+		self.in_use += 1
+		self.high_water = max(self.high_water, self.in_use)
+		return node
+
+	# Take a node out of the game and keep it for later. Its actions are stopped right away, so that nothing survives into its next life; the rest is reset when the node is handed out again.
+	def release(self, node):
+		# Releasing the same node twice would hand it out to two owners later
+		if node in self.free:
+			return
+		node.remove_from_parent()
+		node.remove_all_actions()
+
+		self.in_use = max(0, self.in_use - 1)
+		if len(self.free) < self.capacity:
+			self.free.append(node)
+		else:
+			self.discarded += 1
+
+	def stats(self):
+		return {'hits': self.hits, 'misses': self.misses, 'discarded': self.discarded, 'in_use': self.in_use, 'high_water': self.high_water, 'free': len(self.free)}
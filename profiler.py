@@ -0,0 +1,145 @@
+# ---[ Per-stage frame profiler
+# Times every stage of Game.update (update_player, check_jump, ...) and keeps the last `history` frames in a ring buffer, so that slow frames can be traced back to the stage that caused them. The profiler works by wrapping the stage methods of one game instance; a game that was never instrumented runs its plain methods and pays nothing.
+from __future__ import division
+
+import time
+
+import numpy as np
+
+# The stages called from Game.update, in the order they run
+STAGES = ('update_player', 'modified_jump', 'check_item_collisions', 'check_jump', 'update_items', 'check_laser_collisions', 'check_fall_off', 'spawn_item', 'move_lasers')
+
+
+class FrameProfiler(object):
+	def __init__(self, stages=STAGES, history=600):
+		self.stages = tuple(stages)
+		self.history = history
+
+		# One row per frame: the time spent in every stage, then the whole frame (all in seconds). `frame_ids` holds the number of the frame stored in each row.
+		self.samples = np.zeros((history, len(self.stages) + 1))
+		self.frame_ids = np.full(history, -1, dtype=np.int64)
+		self.frames = 0
+
+		self._row = [0.0]*len(self.stages)
+		self._wrapped = {}
+
+		# Optional LabelNode showing overlay_text(), refreshed every `overlay_every` frames
+		self.overlay = None
+		self.overlay_every = 30
+
+	# ---[ Instrumentation
+	# Replace the stage methods and the update method of `obj` with timed versions
+	def instrument(self, obj, frame_method='update'):
+		for i, name in enumerate(self.stages):
+			self._wrap_stage(obj, name, i)
+
+		original = getattr(obj, frame_method)
+		self._wrapped[frame_method] = original
+		profiler = self
+
+		def timed_frame(*args, **kwargs):
+			row = profiler._row
+			for i in range(len(row)):
+				row[i] = 0.0
+			start = time.perf_counter()
+			result = original(*args, **kwargs)
+			profiler.end_frame(time.perf_counter() - start)
+			return result
+
+		setattr(obj, frame_method, timed_frame)
+
+	def _wrap_stage(self, obj, name, index):
+		original = getattr(obj, name)
+		self._wrapped[name] = original
+		row = self._row
+
+		def timed_stage(*args, **kwargs):
+			start = time.perf_counter()
+			result = original(*args, **kwargs)
+			row[index] += time.perf_counter() - start
+			return result
+
+		setattr(obj, name, timed_stage)
+
+	# Put the original methods back
+	def uninstrument(self, obj):
+		for name in self._wrapped:
+			if name in obj.__dict__:
+				delattr(obj, name)
+		self._wrapped = {}
+
+	# ---[ Recording
+	def end_frame(self, total):
+		i = self.frames % self.history
+		self.samples[i, :-1] = self._row
+		self.samples[i, -1] = total
+		self.frame_ids[i] = self.frames
+		self.frames += 1
+		if self.overlay is not None and self.frames % self.overlay_every == 0:
+			self.overlay.text = self.overlay_text()
+
+	def reset(self):
+		self.samples[:] = 0
+		self.frame_ids[:] = -1
+		self.frames = 0
+
+	# The recorded rows, oldest first
+	def recorded(self):
+		n = min(self.frames, self.history)
+		if self.frames <= self.history:
+			return self.frame_ids[:n], self.samples[:n]
+		start = self.frames % self.history
+		order = np.concatenate((np.arange(start, self.history), np.arange(0, start)))
+		return self.frame_ids[order], self.samples[order]
+
+	# ---[ Statistics (all times in milliseconds)
+	# {stage: (p50, p95, p99)}, including 'frame' for the whole update
+	def percentiles(self):
+		ids, samples = self.recorded()
+		names = self.stages + ('frame',)
+		if not len(ids):
+			return dict((name, (0.0, 0.0, 0.0)) for name in names)
+		p = np.percentile(samples*1000, [50, 95, 99], axis=0)
+		return dict((name, tuple(p[:, j].tolist())) for j, name in enumerate(names))
+
+	# {stage: mean time}, including 'frame' for the whole update
+	def means(self):
+		ids, samples = self.recorded()
+		names = self.stages + ('frame',)
+		if not len(ids):
+			return dict((name, 0.0) for name in names)
+		return dict(zip(names, (samples.mean(axis=0)*1000).tolist()))
+
+	# The `count` slowest frames as (frame number, total, {stage: time}), slowest first
+	def worst_frames(self, count=5):
+		ids, samples = self.recorded()
+		worst = []
+		for i in np.argsort(samples[:, -1])[::-1][:count].tolist():
+			breakdown = dict(zip(self.stages, (samples[i, :-1]*1000).tolist()))
+			worst.append((int(ids[i]), samples[i, -1]*1000, breakdown))
+		return worst
+
+	def report(self, worst=3):
+		lines = ['%-24s %8s %8s %8s' % ('stage (ms)', 'p50', 'p95', 'p99')]
+		stats = self.percentiles()
+		for name in self.stages + ('frame',):
+			lines.append('%-24s %8.3f %8.3f %8.3f' % ((name,) + stats[name]))
+		for frame, total, breakdown in self.worst_frames(worst):
+			slowest = max(breakdown, key=breakdown.get)
+			lines.append('frame %d: %.3f ms (%s %.3f ms)' % (frame, total, slowest, breakdown[slowest]))
+		return '\n'.join(lines)
+
+	# Short text for the on-screen overlay
+	def overlay_text(self):
+		stats = self.percentiles()
+		p50, p95, p99 = stats['frame']
+		slowest = max(self.stages, key=lambda name: stats[name][1])
+		return 'frame p50 %.2f p95 %.2f p99 %.2f ms | %s %.2f' % (p50, p95, p99, slowest, stats[slowest][1])
+
+	# Write the recorded frames to a CSV file (one row per frame, times in milliseconds)
+	def dump(self, path):
+		ids, samples = self.recorded()
+		with open(path, 'w') as f:
+			f.write(','.join(('frame',) + self.stages + ('total',)) + '\n')
+			for frame, row in zip(ids.tolist(), (samples*1000).tolist()):
+				f.write('%d,%s\n' % (frame, ','.join('%.4f' % v for v in row)))
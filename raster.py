@@ -0,0 +1,421 @@
+# ---[ Software rasterizer
+# Draws a scene into a NumPy image, so that a headless game can be looked at: bots get the frame the player would have seen as an observation, and sessions can be written to a video file for review. Everything in the scene tree that has a texture is drawn (ground tiles, blocks, coins, clouds, monsters with their step and dead frames, lasers and the player), in z order, with its position, anchor point, scale (negative scales mirror the sprite) and alpha, followed by the labels in a small bitmap font.
+#
+# Sprites are decoded once into a shared in-memory atlas (one RGBA array for all of them). The headless backend has no image files, so by default every image is replaced by a placeholder of the right size and a recognisable shape and colour; `Atlas(loader=...)` takes real pixels instead. For drawing, a sprite is scaled to the size it is shown at and kept as the list of its visible pixels, so that all the nodes showing the same sprite are blended into the frame in one vectorised operation. Nodes of a batch that overlap (the ground tiles do, and clouds often) go into separate passes, in draw order, so that each is blended on top of the ones drawn before it.
+#
+# Renderer(scene, scale=0.25, gray=True) draws a small grayscale frame, which is what a bot needs and takes a fraction of the time of a full colour frame.
+from __future__ import division
+
+import argparse
+import time
+import zlib
+
+import numpy as np
+
+# ---[ Placeholder sprites
+# Colours (RGB) and shapes of the placeholders, by the first part of the image name that matches
+PLACEHOLDERS = (
+	('plf:AlienPink_hit', (150, 70, 110), 'body'),
+	('plf:AlienPink', (245, 140, 190), 'body'),
+	('plf:Ground', (120, 80, 40), 'ground'),
+	('plf:Item_Coin', (250, 200, 40), 'disc'),
+	('emj:Cloud', (250, 250, 250), 'cloud'),
+	('spc:Laser', (60, 140, 255), 'box'),
+	('plf:Enemy', None, 'enemy'),
+)
+MISSING_COLOR = (255, 0, 255)
+
+
+def _ellipse(w, h, cx, cy, rx, ry):
+	y, x = np.mgrid[0:h, 0:w]
+	return ((x + 0.5 - cx)/rx)**2 + ((y + 0.5 - cy)/ry)**2 <= 1
+
+
+# An RGBA placeholder of w x h pixels for the image called `name` (rows top to bottom)
+def placeholder(name, w, h):
+	color, shape = MISSING_COLOR, 'box'
+	for prefix, c, s in PLACEHOLDERS:
+		if name.startswith(prefix):
+			color, shape = c, s
+			break
+
+	rgb = np.empty((h, w, 3), dtype=np.uint8)
+	if shape == 'enemy':
+		# Every kind of enemy gets its own colour; the dead frame is grey and upside down, the move frame has its legs apart
+		h32 = zlib.crc32(name.rsplit('_', 1)[0].encode())
+		color = (100 + (h32 & 0x7f), 100 + (h32 >> 8 & 0x7f), 100 + (h32 >> 16 & 0x7f))
+		mask = _ellipse(w, h, w/2, h*0.45, w*0.45, h*0.4)
+		legs = (0.25, 0.75) if name.endswith('_move') else (0.35, 0.65)
+		for lx in legs:
+			mask |= _ellipse(w, h, w*lx, h*0.85, w*0.08, h*0.15)
+		if name.endswith('_dead'):
+			mask = mask[::-1]
+			color = (sum(color)//3,)*3
+	elif shape == 'body':
+		mask = _ellipse(w, h, w/2, h*0.55, w*0.45, h*0.45) | _ellipse(w, h, w/2, h*0.22, w*0.3, h*0.2)
+	elif shape == 'disc':
+		mask = _ellipse(w, h, w/2, h/2, w*0.4, h*0.4)
+	elif shape == 'cloud':
+		mask = _ellipse(w, h, w*0.35, h*0.6, w*0.3, h*0.25) | _ellipse(w, h, w*0.6, h*0.45, w*0.35, h*0.3)
+	else:
+		mask = np.ones((h, w), dtype=bool)
+	rgb[:] = color
+	if shape == 'ground':
+		# Grass on top
+		rgb[:max(1, h//5)] = (90, 180, 60)
+
+	rgba = np.zeros((h, w, 4), dtype=np.uint8)
+	rgba[..., :3] = rgb
+	rgba[..., 3] = np.where(mask, 255, 0)
+	return rgba
+
+
+# ---[ Bitmap font
+# 3 x 5 glyphs for the characters the game's labels use (other characters are left blank; letters are drawn as capitals)
+GLYPHS = {
+	'0': '111101101101111', '1': '010110010010111', '2': '111001111100111', '3': '111001111001111', '4': '101101111001001',
+	'5': '111100111001111', '6': '111100111101111', '7': '111001001001001', '8': '111101111101111', '9': '111101111001111',
+	'C': '111100100100111', 'E': '111100111100111', 'G': '111100101101111', 'H': '101101111101101', 'I': '111010010010111',
+	'O': '111101101101111', 'R': '110101110101101', 'S': '111100111001111', ':': '000010000010000', '-': '000000111000000',
+}
+
+
+def _text_mask(text):
+	mask = np.zeros((5, 4*len(text)), dtype=bool)
+	for i, char in enumerate(text.upper()):
+		glyph = GLYPHS.get(char)
+		if glyph is not None:
+			mask[:, 4*i:4*i + 3] = np.array([c == '1' for c in glyph]).reshape(5, 3)
+	return mask
+
+
+# ---[ Sprite atlas
+class Atlas(object):
+	def __init__(self, loader=None, sizes=None, cache_size=1024):
+		# Called as loader(name, w, h) to decode an image into an RGBA array; placeholder() by default
+		self.loader = loader if loader is not None else placeholder
+
+		# Image name -> (w, h) in points, for images whose nodes do not say (the headless backend's table by default)
+		if sizes is None:
+			from headless_scene import TEXTURE_SIZES
+			sizes = TEXTURE_SIZES
+		self.sizes = sizes
+
+		# All decoded images, packed in rows ("shelves") into one RGBA array, and where each one is in it
+		self.pixels = np.zeros((256, 1024, 4), dtype=np.uint8)
+		self.regions = {}
+		self._shelf = [0, 0, 0]	# x, y and height of the shelf being filled
+
+		# Sprites prepared for drawing at a given size, mirroring and colour mode
+		self.cache_size = cache_size
+		self._sprites = {}
+		self.decoded = 0
+
+	def __contains__(self, name):
+		return name in self.regions
+
+	# The RGBA pixels of an image, decoded into the atlas the first time it is asked for
+	def image(self, name, w, h):
+		region = self.regions.get(name)
+		if region is None:
+			region = self._add(name, self.loader(name, w, h))
+		x, y, w, h = region
+		return self.pixels[y:y + h, x:x + w]
+
+	def _add(self, name, rgba):
+		h, w = rgba.shape[:2]
+		x, y, shelf_h = self._shelf
+		if x + w > self.pixels.shape[1]:
+			x, y, shelf_h = 0, y + shelf_h, 0
+		while y + h > self.pixels.shape[0] or w > self.pixels.shape[1]:
+			grown = np.zeros((2*self.pixels.shape[0], max(w, self.pixels.shape[1]), 4), dtype=np.uint8)
+			grown[:self.pixels.shape[0], :self.pixels.shape[1]] = self.pixels
+			self.pixels = grown
+		self.pixels[y:y + h, x:x + w] = rgba
+		self._shelf = [x + w, y, max(shelf_h, h)]
+		region = self.regions[name] = (x, y, w, h)
+		self.decoded += 1
+		return region
+
+	# The visible pixels of `name` drawn at w x h pixels (nearest neighbour), mirrored as asked: their rows, columns, colours (premultiplied by alpha, one channel if gray) and alphas
+	def sprite(self, name, w, h, flip_x=False, flip_y=False, gray=False, size=None):
+		key = (name, w, h, flip_x, flip_y, gray)
+		sprite = self._sprites.get(key)
+		if sprite is not None:
+			return sprite
+
+		if size is None:
+			size = self.sizes.get(name, (w, h))
+		image = self.image(name, int(size[0]), int(size[1]))
+		ih, iw = image.shape[:2]
+		rows = (np.arange(h)*ih//h) if h else np.zeros(0, dtype=np.int64)
+		cols = (np.arange(w)*iw//w) if w else np.zeros(0, dtype=np.int64)
+		if flip_x:
+			cols = cols[::-1]
+		if flip_y:
+			rows = rows[::-1]
+		scaled = image[rows][:, cols].astype(np.float32)/255
+
+		alpha = scaled[..., 3]
+		r, c = np.nonzero(alpha)
+		a = alpha[r, c]
+		color = scaled[r, c, :3]*a[:, None]
+		if gray:
+			color = color.dot(np.array([0.299, 0.587, 0.114], dtype=np.float32))
+		sprite = (r, c, color, a)
+
+		if len(self._sprites) >= self.cache_size:
+			self._sprites.clear()
+		self._sprites[key] = sprite
+		return sprite
+
+	# A label's text as a white sprite, `height` pixels tall
+	def text(self, text, height, gray=False):
+		key = ('text', text, height, gray)
+		sprite = self._sprites.get(key)
+		if sprite is not None:
+			return sprite
+		mask = _text_mask(text)
+		cell = max(1, int(round(height/5)))
+		mask = np.repeat(np.repeat(mask, cell, axis=0), cell, axis=1)
+		r, c = np.nonzero(mask)
+		a = np.ones(len(r), dtype=np.float32)
+		color = a.copy() if gray else np.ones((len(r), 3), dtype=np.float32)
+		sprite = (r, c, color, a, mask.shape[1], mask.shape[0])
+		self._sprites[key] = sprite
+		return sprite
+
+	def stats(self):
+		return {'images': len(self.regions), 'decoded': self.decoded, 'atlas_bytes': self.pixels.nbytes, 'sprites': len(self._sprites)}
+
+
+# The atlas shared by every renderer
+atlas = Atlas()
+
+
+def _color(value):
+	if isinstance(value, str) and value.startswith('#') and len(value) == 7:
+		return tuple(int(value[i:i + 2], 16)/255 for i in (1, 3, 5))
+	named = {'black': (0, 0, 0), 'white': (1, 1, 1)}
+	if isinstance(value, str):
+		return named.get(value, (0, 0, 0))
+	return tuple(value[:3])
+
+
+# ---[ Renderer
+class Renderer(object):
+	def __init__(self, scene, scale=1.0, gray=False, atlas=atlas):
+		self.scene = scene
+		self.scale = scale
+		self.gray = gray
+		self.atlas = atlas
+
+		self.width = int(round(scene.size.w*scale))
+		self.height = int(round(scene.size.h*scale))
+		shape = (self.height, self.width) if gray else (self.height, self.width, 3)
+		self.buffer = np.zeros(shape, dtype=np.float32)
+
+		# Frames drawn, sprites drawn in them, and the time spent
+		self.frames = 0
+		self.sprites = 0
+		self.batches = 0
+		self.seconds = 0.0
+
+	# Everything to draw, as (z, kind, key, left, top) with the top-left corner in pixels; kind is 'sprite' or 'text'
+	def _collect(self):
+		scale = self.scale
+		screen_h = self.scene.size.h
+		items = []
+		stack = [(self.scene, 0.0, 0.0)]
+		while stack:
+			node, ox, oy = stack.pop()
+			for child in node.children:
+				pos = child.position
+				x = ox + pos.x
+				y = oy + pos.y
+				if child.children:
+					stack.append((child, x, y))
+				if child.alpha <= 0:
+					continue
+				text = getattr(child, 'text', None)
+				texture = getattr(child, 'texture', None)
+				ax, ay = getattr(child, 'anchor_point', (0.5, 0.5))
+				if text:
+					height = int(round(child.font[1]*0.7*scale))
+					w = 4*len(text)*max(1, int(round(height/5)))
+					left = x*scale - ax*w
+					bottom = y*scale - ay*height
+					items.append((child.z_position, 'text', (text, height, child.alpha), int(round(left)), int(round(screen_h*scale - bottom - height))))
+				elif texture is not None:
+					size = child.size
+					xs = child.x_scale
+					ys = child.y_scale
+					w = size.w*abs(xs)
+					h = size.h*abs(ys)
+					left = x - ax*w
+					top = y - ay*h + h
+					pw = int(round(w*scale))
+					ph = int(round(h*scale))
+					if not pw or not ph:
+						continue
+					key = (texture.name, pw, ph, xs < 0, ys < 0, child.alpha, (size.w, size.h))
+					items.append((child.z_position, 'sprite', key, int(round(left*scale)), int(round((screen_h - top)*scale))))
+		return items
+
+	# Draw the scene as it is now. Returns the frame as uint8 (height x width x 3, or height x width if gray)
+	def render(self):
+		start = time.perf_counter()
+		buffer = self.buffer
+		bg = _color(self.scene.background_color)
+		buffer[...] = (0.299*bg[0] + 0.587*bg[1] + 0.114*bg[2]) if self.gray else bg
+
+		# Group the nodes by depth and by what they show, keeping the order of the scene tree within a depth
+		batches = {}
+		for z, kind, key, left, top in self._collect():
+			batch = batches.get((z, kind, key))
+			if batch is None:
+				batch = batches[(z, kind, key)] = ([], [])
+			batch[0].append(top)
+			batch[1].append(left)
+
+		flat = buffer.reshape(self.height*self.width, -1) if not self.gray else buffer.reshape(-1)
+		for (z, kind, key), (tops, lefts) in sorted(batches.items(), key=lambda item: item[0][0]):
+			if kind == 'text':
+				text, height, opacity = key
+				rows, cols, color, alpha = self.atlas.text(text, height, self.gray)[:4]
+			else:
+				name, w, h, flip_x, flip_y, opacity, size = key
+				rows, cols, color, alpha = self.atlas.sprite(name, w, h, flip_x, flip_y, self.gray, size)
+			tops = np.array(tops)
+			lefts = np.array(lefts)
+			for layer in _layers(tops, lefts, rows, cols):
+				self._blit(flat, tops[layer], lefts[layer], rows, cols, color, alpha, opacity)
+			self.sprites += len(tops)
+			self.batches += 1
+
+		self.frames += 1
+		frame = (buffer*255 + 0.5).astype(np.uint8)
+		self.seconds += time.perf_counter() - start
+		return frame
+
+	# Blend one sprite, made `opacity` times as opaque, into the frame at every (top, left) at once
+	def _blit(self, flat, tops, lefts, rows, cols, color, alpha, opacity):
+		if not len(rows):
+			return
+		r = tops[:, None] + rows[None, :]
+		c = lefts[:, None] + cols[None, :]
+		inside = (r >= 0) & (r < self.height) & (c >= 0) & (c < self.width)
+		if not inside.any():
+			return
+		index = (r*self.width + c)[inside]
+		which = np.nonzero(inside)[1]
+		a = alpha[which]
+		color = color[which]
+		if opacity != 1:
+			a = a*opacity
+			color = color*opacity
+		if self.gray:
+			flat[index] = flat[index]*(1 - a) + color
+		else:
+			flat[index] = flat[index]*(1 - a)[:, None] + color
+
+	def stats(self):
+		return {
+			'frames': self.frames,
+			'fps': self.frames/self.seconds if self.seconds else 0.0,
+			'sprites_per_frame': self.sprites/self.frames if self.frames else 0.0,
+			'batches_per_frame': self.batches/self.frames if self.frames else 0.0,
+		}
+
+
+# Split the nodes of a batch (all showing the same pixels at (top, left)) into passes in which no two of them overlap. A node goes into the pass after the last one holding a node drawn before it that it overlaps, so overlapping nodes are blended in draw order. Returns index arrays, one per pass
+def _layers(tops, lefts, rows, cols):
+	n = len(tops)
+	if n < 2 or not len(rows):
+		return [np.arange(n)]
+	h = rows.max() - rows.min()
+	w = cols.max() - cols.min()
+	overlap = (np.abs(tops[:, None] - tops[None, :]) <= h) & (np.abs(lefts[:, None] - lefts[None, :]) <= w)
+	if overlap.sum() == n:
+		return [np.arange(n)]
+	layer = np.zeros(n, dtype=np.int64)
+	for i in range(1, n):
+		earlier = np.flatnonzero(overlap[i, :i])
+		if len(earlier):
+			layer[i] = layer[earlier].max() + 1
+	return [np.flatnonzero(layer == k) for k in range(layer.max() + 1)]
+
+
+# ---[ Video
+# Streams frames to a YUV4MPEG2 (.y4m) file: uncompressed, written with NumPy alone, and read by ffmpeg, mpv, VLC... (`ffmpeg -i run.y4m run.mp4` makes it small)
+class VideoWriter(object):
+	def __init__(self, path, fps=60):
+		self.path = path
+		self.fps = fps
+		self.file = open(path, 'wb')
+		self.shape = None
+		self.frames = 0
+
+	def write(self, frame):
+		if self.shape is None:
+			self.shape = frame.shape
+			h, w = frame.shape[:2]
+			colour = 'Cmono' if frame.ndim == 2 else 'C444'
+			self.file.write(('YUV4MPEG2 W%d H%d F%d:1 Ip A1:1 %s\n' % (w, h, self.fps, colour)).encode())
+		elif frame.shape != self.shape:
+			raise ValueError('frame of shape %r in a video of shape %r' % (frame.shape, self.shape))
+
+		self.file.write(b'FRAME\n')
+		if frame.ndim == 2:
+			self.file.write((16 + frame*(219/255)).astype(np.uint8).tobytes())
+		else:
+			rgb = frame.astype(np.float32)/255
+			y = 16 + rgb.dot(np.array([65.481, 128.553, 24.966], dtype=np.float32))
+			u = 128 + rgb.dot(np.array([-37.797, -74.203, 112.0], dtype=np.float32))
+			v = 128 + rgb.dot(np.array([112.0, -93.786, -18.214], dtype=np.float32))
+			for plane in (y, u, v):
+				self.file.write((plane + 0.5).astype(np.uint8).tobytes())
+		self.frames += 1
+
+	def close(self):
+		self.file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+
+# ---[ Command line
+# Play a seeded bot session headlessly and write what it looked like to a video file
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Render a headless bot session to a video file')
+	parser.add_argument('out', help='video file (.y4m)')
+	parser.add_argument('--seed', type=int, default=2)
+	parser.add_argument('--ticks', type=int, default=1800)
+	parser.add_argument('--policy', default='climber', help="bot policy ('idle', 'climber', 'climber/N')")
+	parser.add_argument('--scale', type=float, default=1.0, help='size of the frames relative to the screen')
+	parser.add_argument('--gray', action='store_true')
+	parser.add_argument('--every', type=int, default=1, help='keep one frame in this many')
+	args = parser.parse_args(argv)
+
+	import bots
+	from simulation import Simulation
+
+	sim = Simulation(seed=args.seed)
+	renderer = Renderer(sim.game, args.scale, args.gray)
+	policy = bots.by_name(args.policy)
+	with VideoWriter(args.out, fps=max(1, 60//args.every)) as video:
+		for tick in range(args.ticks):
+			tilt, touches = policy(sim.game, tick)
+			sim.step(tilt, touches)
+			if tick % args.every == 0:
+				video.write(renderer.render())
+	stats = renderer.stats()
+	print('%d frames of %dx%d, %.0f frames/s (%.1f sprites in %.1f batches per frame), score %d' % (video.frames, renderer.width, renderer.height, stats['fps'], stats['sprites_per_frame'], stats['batches_per_frame'], sim.game.score))
+	return 0
+
+
+if __name__ == '__main__':
+	raise SystemExit(main())
@@ -0,0 +1,144 @@
+# ---[ Session recording and replay
+# A session is fully described by the seed of the game and, for every frame, the tilt of the device and the number of taps. That is all a recording holds: 5 bytes per frame (two 16-bit tilt components and a tap count), zlib-compressed, behind a small header. Replaying it through Game.update reproduces the run exactly, either at real time or as fast as the CPU allows.
+#
+# Recording and playback are both 'input sources': an object stored in Game.input_source whose tick() is called at the start of every update and whose `gravity` replaces sc.gravity() for that frame. The recorder quantises the live tilt before the game sees it, so the recorded game and the replayed game use identical numbers.
+from __future__ import division
+
+import random
+import struct
+import time
+import zlib
+
+from backend import sc
+
+MAGIC = b'DJRP'
+VERSION = 1
+
+# magic, version, seed, frames per second, number of frames, final score, final camera height
+HEADER = struct.Struct('<4sBIHIid')
+
+# tilt x, tilt y (both scaled by QUANT), taps
+FRAME = struct.Struct('<hhB')
+QUANT = 32767
+
+
+def quantize(v):
+	return int(round(max(-1.0, min(1.0, v))*QUANT))
+
+
+# ---[ Recording
+class Recorder(object):
+	def __init__(self, seed=None, fps=60):
+		self.seed = seed if seed is not None else random.getrandbits(32)
+		self.fps = fps
+		self.data = bytearray()
+		self.frames = 0
+		self.taps = 0
+		self.gravity = (0.0, 0.0, -1.0)
+		self.game = None
+
+	# Record `game` from its very first frame. Must be called before the game is presented, because the seed is used in setup()
+	def attach(self, game):
+		game.seed = self.seed
+		game.input_source = self
+		self.game = game
+		return self
+
+	def tick(self, game):
+		g = sc.gravity()
+		qx = quantize(g.x)
+		qy = quantize(g.y)
+		self.data += FRAME.pack(qx, qy, min(self.taps, 255))
+		self.taps = 0
+		self.frames += 1
+		self.gravity = (qx/QUANT, qy/QUANT, g.z)
+
+	def touch(self):
+		self.taps += 1
+
+	def to_bytes(self):
+		game = self.game
+		score = game.score if game is not None else 0
+		height = game.camera_y if game is not None else 0.0
+		return HEADER.pack(MAGIC, VERSION, self.seed, self.fps, self.frames, score, height) + zlib.compress(bytes(self.data))
+
+	def save(self, path):
+		with open(path, 'wb') as f:
+			f.write(self.to_bytes())
+
+
+# ---[ Playback
+class Replay(object):
+	def __init__(self, seed, fps, frames, body, final_score=None, final_height=None):
+		self.seed = seed
+		self.fps = fps
+		self.frames = frames
+		self.body = body
+		self.final_score = final_score
+		self.final_height = final_height
+
+	@classmethod
+	def from_bytes(cls, data):
+		magic, version, seed, fps, frames, score, height = HEADER.unpack_from(data)
+		if magic != MAGIC or version != VERSION:
+			raise ValueError('not a recording (or an unsupported version)')
+		body = zlib.decompress(data[HEADER.size:])
+		if len(body) != frames*FRAME.size:
+			raise ValueError('truncated recording')
+		return cls(seed, fps, frames, body, score, height)
+
+	@classmethod
+	def load(cls, path):
+		with open(path, 'rb') as f:
+			return cls.from_bytes(f.read())
+
+	# (tilt x, tilt y, taps) for every frame
+	def samples(self):
+		for qx, qy, taps in FRAME.iter_unpack(self.body):
+			yield qx/QUANT, qy/QUANT, taps
+
+	# Input source that feeds this recording into a game
+	def player(self):
+		return Player(self)
+
+	# Replay the whole session on a fresh headless game and return the simulation. With realtime=True the frames are paced to the recorded frame rate, otherwise they run as fast as possible.
+	def run(self, realtime=False):
+		from simulation import Simulation
+
+		sim = Simulation(fps=self.fps, seed=self.seed)
+		sim.game.input_source = self.player()
+		start = time.time()
+		for i in range(self.frames):
+			sim.step()
+			if realtime:
+				delay = start + (i + 1)/self.fps - time.time()
+				if delay > 0:
+					time.sleep(delay)
+		return sim
+
+	# True if replaying ends in the same score and height as the recorded session
+	def verify(self):
+		game = self.run().game
+		return game.score == self.final_score and game.camera_y == self.final_height
+
+
+class Player(object):
+	def __init__(self, replay):
+		self.frames = replay.samples()
+		self.gravity = (0.0, 0.0, -1.0)
+		self.finished = False
+
+	# Set the tilt of the next recorded frame and replay its taps. After the end of the recording the device is held flat.
+	def tick(self, game):
+		try:
+			x, y, taps = next(self.frames)
+		except StopIteration:
+			self.finished = True
+			self.gravity = (0.0, 0.0, -1.0)
+			return
+		self.gravity = (x, y, -1.0)
+		for i in range(taps):
+			game.touch_began(sc.Touch(game.size.w/2, game.size.h/2, i))
+
+	def touch(self):
+		pass
@@ -0,0 +1,197 @@
+# ---[ High scores and run history
+# Every finished game (from the game itself, or from a farm sweep) is kept as one row of an SQLite database in WAL mode. add() only puts the run in a queue: a background thread writes the queue in batches, one transaction per batch, so neither the game loop nor a sweep waits for the disk, and hundreds of thousands of runs per minute can be ingested. The best score ever is kept in a one-row table updated with every batch (and in memory), so loading it at startup is a single primary key lookup, however long the history is.
+#
+# The runs are indexed by score, by seed and by difficulty, so the top-k queries below only read the rows they return. WAL mode lets them run while the writer thread is committing.
+from __future__ import division
+
+import queue
+import sqlite3
+import threading
+import time
+
+# The columns of a run, and their types. Keys of a run dict that are not listed here are ignored; missing ones are stored as NULL
+COLUMNS = (
+	('finished', 'REAL'),		# time.time() when the run was added
+	('seed', 'INTEGER'),
+	('game', 'INTEGER'),		# number of the game in its session (the seed is shared by all the games of a session)
+	('policy', 'TEXT'),			# the bot that played, NULL for a person
+	('speed_cap', 'REAL'),
+	('speed_step', 'REAL'),
+	('item_chance', 'REAL'),
+	('score', 'INTEGER'),
+	('height', 'REAL'),
+	('ticks', 'INTEGER'),
+	('cause', 'TEXT'),
+	('coins', 'INTEGER'),
+	('landings', 'INTEGER'),
+	('speed', 'REAL'),
+)
+NAMES = tuple(name for name, kind in COLUMNS)
+DIFFICULTY = ('speed_cap', 'speed_step', 'item_chance')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, %s);
+CREATE INDEX IF NOT EXISTS runs_score ON runs (score DESC);
+CREATE INDEX IF NOT EXISTS runs_seed ON runs (seed, score DESC);
+CREATE INDEX IF NOT EXISTS runs_difficulty ON runs (speed_cap, speed_step, item_chance, score DESC);
+CREATE TABLE IF NOT EXISTS best (id INTEGER PRIMARY KEY CHECK (id = 0), score INTEGER NOT NULL);
+INSERT OR IGNORE INTO best VALUES (0, 0);
+''' % ', '.join('%s %s' % column for column in COLUMNS)
+
+INSERT = 'INSERT INTO runs (%s) VALUES (%s)' % (', '.join(NAMES), ', '.join('?'*len(NAMES)))
+
+_STOP = object()
+
+
+def _connect(path):
+	db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+	db.execute('PRAGMA journal_mode=WAL')
+	# In WAL mode, syncing at checkpoints only is still safe against corruption (a crash can only lose the last batches)
+	db.execute('PRAGMA synchronous=NORMAL')
+	return db
+
+
+class ScoreStore(object):
+	def __init__(self, path, batch_size=5000, flush_interval=0.5):
+		self.path = path
+		self.batch_size = batch_size
+		self.flush_interval = flush_interval
+
+		# Queries run on this connection (any thread, one at a time); the writer thread has its own
+		self._db = _connect(path)
+		self._db.executescript(SCHEMA)
+		self._lock = threading.Lock()
+		self._best = self._db.execute('SELECT score FROM best WHERE id = 0').fetchone()[0]
+
+		self.added = 0
+		self.written = 0
+		self.batches = 0
+		# The exception that stopped the writer thread, if any
+		self.error = None
+
+		self._queue = queue.Queue()
+		self._writer = threading.Thread(target=self._write_loop, name='ScoreStore writer')
+		self._writer.daemon = True
+		self._writer.start()
+
+	# ---[ Writing
+	# Queue a finished run (a dict, see COLUMNS). Returns right away (raises the writer's error if it failed)
+	def add(self, run):
+		self._check()
+		row = tuple(run.get(name) for name in NAMES)
+		if row[0] is None:
+			row = (time.time(),) + row[1:]
+		score = run.get('score')
+		if score is not None and score > self._best:
+			self._best = score
+		self.added += 1
+		self._queue.put(row)
+
+	def add_many(self, runs):
+		for run in runs:
+			self.add(run)
+
+	def _write_loop(self):
+		db = None
+		try:
+			db = _connect(self.path)
+			self._write_batches(db)
+		except Exception as e:
+			# Keep the error for add(), flush() and close() to raise: the runs still queued are lost
+			self.error = e
+		finally:
+			if db is not None:
+				db.close()
+
+	def _write_batches(self, db):
+		q = self._queue
+		stop = False
+		while not stop:
+			item = q.get()
+			rows = []
+			if item is _STOP:
+				stop = True
+			else:
+				rows.append(item)
+				# Wait a little for more runs, then take everything that is waiting (up to a batch)
+				deadline = time.time() + self.flush_interval
+				while len(rows) < self.batch_size:
+					remaining = deadline - time.time()
+					try:
+						item = q.get(timeout=remaining) if remaining > 0 else q.get_nowait()
+					except queue.Empty:
+						break
+					if item is _STOP:
+						stop = True
+						break
+					rows.append(item)
+			if rows:
+				best = max(row[NAMES.index('score')] or 0 for row in rows)
+				db.execute('BEGIN')
+				db.executemany(INSERT, rows)
+				db.execute('UPDATE best SET score = max(score, ?) WHERE id = 0', (best,))
+				db.execute('COMMIT')
+				self.written += len(rows)
+				self.batches += 1
+			for i in range(len(rows) + (1 if stop else 0)):
+				q.task_done()
+
+	# Wait until every run added so far is in the database. Raises the writer's error if it failed (instead of waiting for runs it will never write)
+	def flush(self):
+		q = self._queue
+		with q.all_tasks_done:
+			while q.unfinished_tasks and self._writer.is_alive():
+				q.all_tasks_done.wait(0.1)
+		self._check()
+
+	def close(self):
+		if self._writer.is_alive():
+			self._queue.put(_STOP)
+			self._writer.join()
+		with self._lock:
+			self._db.close()
+		self._check()
+
+	def _check(self):
+		if self.error is not None:
+			raise self.error
+
+	# ---[ Queries
+	# The best score ever (runs still waiting in the queue included)
+	def best(self):
+		return self._best
+
+	def _query(self, sql, args=()):
+		with self._lock:
+			cursor = self._db.execute(sql, args)
+			names = [d[0] for d in cursor.description]
+			return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+	# The k best runs, optionally only those of one seed, one difficulty (speed_cap, speed_step, item_chance) and/or one policy. Runs still in the queue are not included; flush() first to see them
+	def top(self, k=10, seed=None, difficulty=None, policy=None):
+		where = []
+		args = []
+		if seed is not None:
+			where.append('seed = ?')
+			args.append(seed)
+		if difficulty is not None:
+			for name, value in zip(DIFFICULTY, difficulty):
+				where.append('%s = ?' % name)
+				args.append(value)
+		if policy is not None:
+			where.append('policy = ?')
+			args.append(policy)
+		sql = 'SELECT id, %s FROM runs' % ', '.join(NAMES)
+		if where:
+			sql += ' WHERE ' + ' AND '.join(where)
+		return self._query(sql + ' ORDER BY score DESC LIMIT ?', args + [k])
+
+	# Number of runs, mean and best score for every difficulty
+	def difficulties(self):
+		return self._query('SELECT speed_cap, speed_step, item_chance, count(*) AS runs, avg(score) AS mean_score, max(score) AS best FROM runs GROUP BY speed_cap, speed_step, item_chance')
+
+	def count(self):
+		return self._query('SELECT count(*) AS runs FROM runs')[0]['runs']
+
+	def stats(self):
+		return {'added': self.added, 'written': self.written, 'batches': self.batches, 'queued': self._queue.qsize(), 'best': self._best}
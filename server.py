@@ -0,0 +1,298 @@
+# ---[ Control server
+# Lets an agent in another process (any language) play headless games over a local socket. The server hosts any number of game instances ("envs", each a simulation.Simulation) and plays them on request: a step request carries the tilt and taps of a whole batch of envs and a number of ticks to play them for, so one round trip can advance hundreds of games by several ticks, and the reply carries the compact state of every one of them. Observations (frames drawn by raster.Renderer) can be asked for in the same binary form.
+#
+# Messages in both directions are a 4-byte little-endian length followed by a body whose first byte is the operation:
+#
+#   CREATE   <B I I>  op, n, seed (0xffffffff: random)         -> <B I I> op, first id, n  (ids first .. first+n-1, seeds seed .. seed+n-1)
+#   STEP     <B I H>  op, ticks, k  + k ACTION records          -> <B H> op, k  + k STATE_RECORD records
+#   STATE    <B H>    op, k  + k uint32 ids                     -> <B H> op, k  + k STATE_RECORD records
+#   OBSERVE  <B f H>  op, scale, k  + k uint32 ids              -> <B H H H> op, k, height, width  + k grayscale frames (uint8)
+#   CLOSE    <B H>    op, k  + k uint32 ids                     -> <B> op
+#
+# The records are packed C structs, laid out by the NumPy dtypes ACTION and STATE_RECORD below. The tilt of a step is held for all of its ticks (it replaces sc.gravity() in update_player); the taps fire lasers (touch_began) on its first tick. An error (including a request beyond the MAX_ limits below) is answered with ERROR followed by a UTF-8 message, and the connection stays usable.
+#
+#   python server.py --unix /tmp/doodle.sock
+#   python server.py --port 5555             (127.0.0.1 only)
+from __future__ import division, print_function
+
+import os
+os.environ.setdefault('DOODLE_HEADLESS', '1')
+
+import argparse
+import asyncio
+import random
+import socket
+import struct
+
+import numpy as np
+
+from simulation import Simulation
+from telemetry import CAUSES
+
+# ---[ Protocol
+LENGTH = struct.Struct('<I')
+
+CREATE = 1
+STEP = 2
+STATE = 3
+OBSERVE = 4
+CLOSE = 5
+ERROR = 255
+
+CREATE_REQUEST = struct.Struct('<BII')
+CREATE_REPLY = struct.Struct('<BII')
+STEP_REQUEST = struct.Struct('<BIH')
+IDS_REQUEST = struct.Struct('<BH')
+OBSERVE_REQUEST = struct.Struct('<BfH')
+COUNT_REPLY = struct.Struct('<BH')
+OBSERVE_REPLY = struct.Struct('<BHHH')
+
+RANDOM_SEED = 0xffffffff
+
+# Limits of one request, checked before anything is allocated: envs created at once, ticks per step, the frame scale and the size of the frames of one observation
+MAX_CREATE = 10000
+MAX_TICKS = 3600
+MAX_SCALE = 2.0
+MAX_OBSERVE_BYTES = 1 << 28
+
+# Blocks and monsters reported in a state (the lowest ones; missing ones are NaN)
+STATE_BLOCKS = 6
+STATE_MONSTERS = 4
+
+ACTION = np.dtype([('id', '<u4'), ('tilt_x', '<f4'), ('tilt_y', '<f4'), ('taps', 'u1')])
+
+# Positions are in world coordinates (the bottom of the screen is at camera_y); `jump` is the tick within the current jump
+STATE_RECORD = np.dtype([
+	('id', '<u4'), ('tick', '<u4'), ('score', '<i4'), ('jump', '<i2'), ('game_over', 'u1'), ('cause', 'u1'),
+	('x', '<f4'), ('y', '<f4'), ('camera_y', '<f4'), ('speed', '<f4'),
+	('blocks', '<f4', (STATE_BLOCKS, 2)), ('monsters', '<f4', (STATE_MONSTERS, 2)),
+])
+
+
+def _ids(body, offset, k):
+	return np.frombuffer(body, dtype='<u4', count=k, offset=offset).tolist()
+
+
+# ---[ Game host
+class Host(object):
+	def __init__(self):
+		self.envs = {}
+		self.next_id = 0
+		self.renderers = {}
+
+		self.requests = 0
+		self.ticks = 0
+
+	def create(self, n, seed=None):
+		first = self.next_id
+		if seed is None:
+			seed = random.getrandbits(31)
+		for i in range(n):
+			self.envs[first + i] = Simulation(seed=seed + i)
+		self.next_id += n
+		return first
+
+	def close(self, ids):
+		for i in ids:
+			self.envs.pop(i, None)
+			self.renderers.pop(i, None)
+
+	def _env(self, i):
+		env = self.envs.get(i)
+		if env is None:
+			raise KeyError('no env %d' % i)
+		return env
+
+	# Play every env of `actions` (an ACTION array) for `ticks` ticks
+	def step(self, actions, ticks):
+		envs = [self._env(i) for i in actions['id'].tolist()]
+		for env, tilt_x, tilt_y, taps in zip(envs, actions['tilt_x'].tolist(), actions['tilt_y'].tolist(), actions['taps'].tolist()):
+			tilt = (tilt_x, tilt_y)
+			env.step(tilt, taps)
+			for t in range(ticks - 1):
+				env.step(tilt)
+		self.ticks += ticks*len(envs)
+		return self.state(actions['id'].tolist())
+
+	def state(self, ids):
+		states = np.zeros(len(ids), dtype=STATE_RECORD)
+		blocks = np.full((len(ids), STATE_BLOCKS, 2), np.nan, dtype=np.float32)
+		monsters = np.full((len(ids), STATE_MONSTERS, 2), np.nan, dtype=np.float32)
+		rows = []
+		for k, i in enumerate(ids):
+			env = self._env(i)
+			game = env.game
+			pos = game.player.position
+			rows.append((i, env.tick, game.score, game.count % game.jump_period, game.game_over, CAUSES.get(game.death_cause, 0), pos.x, game.to_world(pos.y), game.camera_y, game.speed))
+			nb = min(len(game.blocks), STATE_BLOCKS)
+			if nb:
+				blocks[k, :nb] = [tuple(block.position) for block in game.blocks[:nb]]
+			g = game.items.monsters
+			nm = min(g.n, STATE_MONSTERS)
+			monsters[k, :nm, 0] = g.x[:nm]
+			monsters[k, :nm, 1] = g.y[:nm]
+		# Fill the records column by column
+		if rows:
+			for name, column in zip(STATE_RECORD.names, zip(*rows)):
+				states[name] = column
+		states['blocks'] = blocks
+		states['monsters'] = monsters
+		return states
+
+	# Grayscale frames of the envs, drawn at `scale` times the screen size
+	def observe(self, ids, scale):
+		import raster
+		envs = [self._env(i) for i in ids]
+		if envs:
+			size = envs[0].game.size
+			if len(envs)*round(size.w*scale)*round(size.h*scale) > MAX_OBSERVE_BYTES:
+				raise ValueError('an observation can be at most %d bytes of frames' % MAX_OBSERVE_BYTES)
+		frames = []
+		for i, env in zip(ids, envs):
+			renderer = self.renderers.get(i)
+			if renderer is None or renderer.scale != scale:
+				renderer = self.renderers[i] = raster.Renderer(env.game, scale, gray=True)
+			frames.append(renderer.render())
+		return np.array(frames, dtype=np.uint8).reshape((len(ids),) + (frames[0].shape if frames else (0, 0)))
+
+	# Answer one request (a message body without its length)
+	def handle(self, body):
+		self.requests += 1
+		try:
+			op = body[0]
+			if op == STEP:
+				op, ticks, k = STEP_REQUEST.unpack_from(body)
+				if not 1 <= ticks <= MAX_TICKS:
+					raise ValueError('ticks must be between 1 and %d' % MAX_TICKS)
+				actions = np.frombuffer(body, dtype=ACTION, count=k, offset=STEP_REQUEST.size)
+				return COUNT_REPLY.pack(STEP, k) + self.step(actions, ticks).tobytes()
+			if op == STATE:
+				op, k = IDS_REQUEST.unpack_from(body)
+				return COUNT_REPLY.pack(STATE, k) + self.state(_ids(body, IDS_REQUEST.size, k)).tobytes()
+			if op == OBSERVE:
+				op, scale, k = OBSERVE_REQUEST.unpack_from(body)
+				if not 0 < scale <= MAX_SCALE:
+					raise ValueError('scale must be above 0 and at most %g' % MAX_SCALE)
+				frames = self.observe(_ids(body, OBSERVE_REQUEST.size, k), scale)
+				return OBSERVE_REPLY.pack(OBSERVE, k, frames.shape[1], frames.shape[2]) + frames.tobytes()
+			if op == CREATE:
+				op, n, seed = CREATE_REQUEST.unpack_from(body)
+				if n > MAX_CREATE:
+					raise ValueError('at most %d envs can be created at once' % MAX_CREATE)
+				return CREATE_REPLY.pack(CREATE, self.create(n, None if seed == RANDOM_SEED else seed), n)
+			if op == CLOSE:
+				op, k = IDS_REQUEST.unpack_from(body)
+				self.close(_ids(body, IDS_REQUEST.size, k))
+				return bytes((CLOSE,))
+			raise ValueError('unknown operation %d' % op)
+		except (KeyError, ValueError, IndexError, struct.error) as e:
+			return bytes((ERROR,)) + str(e.args[0] if e.args else e).encode('utf-8')
+		except Exception as e:
+			# Anything else (a bug, running out of memory) is answered the same way, so that the connection stays usable
+			return bytes((ERROR,)) + ('%s: %s' % (type(e).__name__, e)).encode('utf-8')
+
+
+# ---[ Serving
+class Server(object):
+	def __init__(self, host=None):
+		self.host = host if host is not None else Host()
+
+	async def _client(self, reader, writer):
+		handle = self.host.handle
+		try:
+			while True:
+				head = await reader.readexactly(LENGTH.size)
+				body = await reader.readexactly(LENGTH.unpack(head)[0])
+				reply = handle(body)
+				writer.write(LENGTH.pack(len(reply)) + reply)
+				await writer.drain()
+		except (asyncio.IncompleteReadError, ConnectionError):
+			pass
+		finally:
+			writer.close()
+
+	async def start(self, path=None, port=None):
+		if path is not None:
+			if os.path.exists(path):
+				os.unlink(path)
+			return await asyncio.start_unix_server(self._client, path)
+		return await asyncio.start_server(self._client, '127.0.0.1', port)
+
+	def run(self, path=None, port=None):
+		async def serve():
+			server = await self.start(path, port)
+			async with server:
+				await server.serve_forever()
+		asyncio.run(serve())
+
+
+# ---[ Client
+# A blocking client for agents written in Python. `address` is the path of a Unix socket or a (host, port) pair
+class Client(object):
+	def __init__(self, address):
+		if isinstance(address, str):
+			self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		else:
+			self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+			self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		self.sock.connect(address)
+
+	def _recv(self, n):
+		data = bytearray()
+		while len(data) < n:
+			chunk = self.sock.recv(n - len(data))
+			if not chunk:
+				raise ConnectionError('server closed the connection')
+			data += chunk
+		return bytes(data)
+
+	def _call(self, body):
+		self.sock.sendall(LENGTH.pack(len(body)) + body)
+		reply = self._recv(LENGTH.unpack(self._recv(LENGTH.size))[0])
+		if reply[0] == ERROR:
+			raise RuntimeError(reply[1:].decode('utf-8'))
+		return reply
+
+	def create(self, n=1, seed=None):
+		op, first, n = CREATE_REPLY.unpack(self._call(CREATE_REQUEST.pack(CREATE, n, RANDOM_SEED if seed is None else seed)))
+		return list(range(first, first + n))
+
+	# Play the envs `ids` for `ticks` ticks with the given tilts (scalars or one per env) and taps. Returns their STATE_RECORD records
+	def step(self, ids, tilt_x=0.0, tilt_y=0.0, taps=0, ticks=1):
+		actions = np.zeros(len(ids), dtype=ACTION)
+		actions['id'] = ids
+		actions['tilt_x'] = tilt_x
+		actions['tilt_y'] = tilt_y
+		actions['taps'] = taps
+		reply = self._call(STEP_REQUEST.pack(STEP, ticks, len(ids)) + actions.tobytes())
+		return np.frombuffer(reply, dtype=STATE_RECORD, offset=COUNT_REPLY.size)
+
+	def state(self, ids):
+		reply = self._call(IDS_REQUEST.pack(STATE, len(ids)) + np.asarray(ids, dtype='<u4').tobytes())
+		return np.frombuffer(reply, dtype=STATE_RECORD, offset=COUNT_REPLY.size)
+
+	def observe(self, ids, scale=0.25):
+		reply = self._call(OBSERVE_REQUEST.pack(OBSERVE, scale, len(ids)) + np.asarray(ids, dtype='<u4').tobytes())
+		op, k, h, w = OBSERVE_REPLY.unpack_from(reply)
+		return np.frombuffer(reply, dtype=np.uint8, offset=OBSERVE_REPLY.size).reshape(k, h, w)
+
+	def close_envs(self, ids):
+		self._call(IDS_REQUEST.pack(CLOSE, len(ids)) + np.asarray(ids, dtype='<u4').tobytes())
+
+	def close(self):
+		self.sock.close()
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Serve headless games to external agents')
+	parser.add_argument('--unix', help='path of the Unix socket to listen on')
+	parser.add_argument('--port', type=int, default=5555, help='TCP port on 127.0.0.1 (when --unix is not given)')
+	args = parser.parse_args(argv)
+
+	print('serving on %s' % (args.unix or '127.0.0.1:%d' % args.port))
+	Server().run(args.unix, None if args.unix else args.port)
+	return 0
+
+
+if __name__ == '__main__':
+	raise SystemExit(main())
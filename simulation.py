@@ -0,0 +1,51 @@
+# ---[ Headless simulation driver
+# Steps a Game on an explicit tick clock instead of the renderer's wall clock. Every call to step() is exactly one frame (update() plus all running actions); at the default 60 fps that is one tick of game logic, so thousands of ticks can be simulated per second with no window, no sound and no device attached.
+from __future__ import division
+
+import math
+
+import backend
+from backend import sc
+
+from Game import Game
+
+
+class Simulation(object):
+	def __init__(self, game=None, size=None, fps=60, seed=None):
+		if not backend.HEADLESS:
+			raise RuntimeError('Simulation needs the headless backend (set DOODLE_HEADLESS=1 before importing the game)')
+
+		self.game = game if game is not None else Game()
+		if seed is not None:
+			self.game.seed = seed
+		self.dt = 1/fps
+
+		# The game runs its logic in ticks of 1/60 s. With a lower fps every step runs several ticks at once (e.g. fps=15 runs 4 ticks per step), so make sure none are dropped
+		self.game.max_frame_ticks = max(self.game.max_frame_ticks, int(math.ceil(self.game.tick_rate/fps)))
+
+		# The tick clock: the number of frames simulated so far
+		self.tick = 0
+
+		self.game.present(size)
+
+	@property
+	def t(self):
+		return self.tick*self.dt
+
+	# Simulate a single frame. `tilt` is the (x, y) part of the gravity vector the device would report, and `touches` is the number of taps on the screen since the previous frame.
+	def step(self, tilt=(0.0, 0.0), touches=0):
+		sc.set_gravity(tilt[0], tilt[1], -1.0)
+		for i in range(touches):
+			self.game.touch_began(sc.Touch(self.game.size.w/2, self.game.size.h/2, i))
+		self.game.advance(self.dt)
+		self.tick += 1
+
+	# Simulate `ticks` frames. `policy` is an optional function called as policy(game, tick) before every frame, returning a (tilt, touches) pair; without it the device is held flat and nobody taps.
+	def run(self, ticks, policy=None):
+		for i in range(ticks):
+			if policy is None:
+				self.step()
+			else:
+				tilt, touches = policy(self.game, self.tick)
+				self.step(tilt, touches)
+		return self.game
@@ -0,0 +1,214 @@
+# ---[ Game state snapshots
+# capture() copies everything that decides how a Game continues into a Snapshot made of plain numbers, tuples and small arrays: the player and the jump, the camera scroll, the blocks, every coin, cloud and monster (with the order of the broad-phase grid, which decides the order collisions are handled in), the lasers in flight, the pending timers, the score and difficulty, the level stream, and the state of both random number generators. restore() puts a game back into that state, taking the sprite nodes from the pools, so that it continues exactly as it did after the snapshot was taken. This allows instant rewind/retry, and lets a bot try several branches from the same point without replaying the game from the start.
+#
+# A snapshot never refers to sprite nodes, so it stays valid however the game changes afterwards, and can be restored any number of times. The input source (a replay, a bot) is not part of it: whoever restores a snapshot also decides which input follows. Parts that did not change since the previous snapshot (the blocks, the monster types, an unused generator...) are shared with it instead of copied, so a long history of snapshots stays small.
+from __future__ import division
+
+import numpy as np
+
+from textures import textures
+
+# The per-entity arrays of the entity store that are kept (see entities.ARRAYS)
+ITEM_ARRAYS = ('x', 'y', 'vel', 'dir', 'destroyed', 'shown_x', 'shown_y', 'shown_xs', 'shown_ys', 'frame', 'cell')
+
+# Plain attributes of the game that are copied as they are
+SCALARS = ('count', 'jump_counter', 'moving', 'scroll_step', 'camera_y', 'jumped', 'score', 'high_score_val', 'speed', 'vel_scale', 'step', 'game_over', 'death_cause', 'touched_down', 'drop_ticks', 'player_texture', 'games', 'game_start', 'coins_collected', 'landings')
+
+
+class Snapshot(object):
+	__slots__ = ('tick', 'scalars', 'player', 'blocks', 'block_cells', 'current_block', 'groups', 'lasers', 'dying', 'timers', 'rng', 'item_rng', 'level', 'level_items')
+
+	# Bytes taken by the arrays of the snapshot (the tuples are small next to them)
+	def size(self):
+		total = 0
+		for g in self.groups:
+			total += sum(a.nbytes for a in g[0])
+		return total + self.rng[1].nbytes + self.item_rng[1].nbytes
+
+
+# Reuse `old` if it is equal to `new`, so that unchanged parts are shared between snapshots
+def _share(new, old):
+	if old is None:
+		return new
+	if isinstance(new, np.ndarray):
+		if old.shape == new.shape and np.array_equal(old, new):
+			return old
+		return new
+	return old if old == new else new
+
+
+# The grid buckets of a list of nodes, as (cell key, node indices) in the grid's own order
+def _cells(grid, nodes):
+	index = dict((node, i) for i, node in enumerate(nodes))
+	return tuple((key, tuple(index[node] for node in bucket)) for key, bucket in grid.cells.items())
+
+
+def _set_cells(grid, cells, nodes):
+	grid.cells = dict((key, dict.fromkeys(nodes[i] for i in indices)) for key, indices in cells)
+
+
+# ---[ Capturing
+def capture(game, base=None):
+	s = Snapshot()
+	s.tick = game.timers.now
+	s.scalars = tuple(getattr(game, name) for name in SCALARS)
+	player = game.player
+	pos = player.position
+	s.player = (pos.x, pos.y - game.render_offset, player.x_scale)
+
+	blocks = game.blocks
+	s.blocks = _share(tuple((b.position.x, b.position.y) for b in blocks), base and base.blocks)
+	s.block_cells = _share(_cells(game.block_grid, blocks), base and base.block_cells)
+	current = getattr(game, 'current_block', None)
+	s.current_block = blocks.index(current) if current in blocks else -1
+
+	groups = []
+	for k, g in enumerate(game.items.groups):
+		n = g.n
+		old = base.groups[k] if base is not None else None
+		arrays = tuple(_share(getattr(g, name)[:n].copy(), old and old[0][i]) for i, name in enumerate(ITEM_ARRAYS))
+		types = _share(tuple(getattr(node, 'enemy_type', None) for node in g.nodes), old and old[1])
+		scales = _share(tuple((node.x_scale, node.y_scale) for node in g.nodes), old and old[2])
+		cells = _share(_cells(g.grid, g.nodes), old and old[3])
+		groups.append((arrays, types, scales, cells, (g.half_w, g.half_h)))
+	s.groups = tuple(groups)
+
+	# Lasers (with the tick their removal is due) and monsters that were shot and wait to be removed, then every other pending timer
+	lasers = []
+	dying = []
+	timers = []
+	for slot in game.timers.slots:
+		for timer in slot:
+			if not timer.active:
+				continue
+			if timer.callback == game.remove_laser:
+				continue
+			if timer.callback == game.release and hasattr(timer.args[0], 'enemy_type'):
+				m = timer.args[0]
+				dying.append((timer.due, m.position.x, m.position.y, m.enemy_type, m.x_scale, m.y_scale, m.z_position))
+				continue
+			timers.append((timer.due, timer.callback.__name__, timer.args))
+	for laser in game.lasers:
+		lasers.append((laser.timer.due if laser.timer is not None else s.tick, laser.position.x, laser.position.y))
+	s.lasers = _share(tuple(lasers), base and base.lasers)
+	s.dying = _share(tuple(dying), base and base.dying)
+	s.timers = tuple(timers)
+
+	# Python's generator state as an array (far smaller than its tuple of 625 ints), NumPy's as it is
+	version, state, gauss = game.rng.getstate()
+	old = base and base.rng
+	s.rng = (version, _share(np.array(state, dtype=np.uint32), old and old[1]), gauss)
+	name, keys, pos, has_gauss, cached = game.items.rng.get_state()
+	old = base and base.item_rng
+	s.item_rng = (name, _share(keys, old and old[1]), pos, has_gauss, cached)
+
+	# The level stream (with chunked levels), which shares the chunks it already generated, and the items of the chunks taken that are not in the game yet (a heap of tuples)
+	s.level = game.level.copy() if game.level is not None else None
+	s.level_items = _share(tuple(game.level_items), base and base.level_items)
+	return s
+
+
+# ---[ Restoring
+def restore(game, s):
+	from Game import Block, Coin, Cloud, Monster, Laser, monster_texture
+
+	timers = game.timers
+	sprites = game.sprites
+
+	# Give every node that is going to be replaced back to its pool: shot monsters waiting for removal, lasers, items and blocks
+	for slot in timers.slots:
+		for timer in slot:
+			if timer.active and timer.callback == game.release:
+				game.release(timer.args[0])
+	timers.clear()
+	for laser in game.lasers:
+		game.release(laser)
+	for item in game.items:
+		game.release(item)
+	game.items.clear()
+	for block in game.blocks:
+		game.release(block)
+
+	for name, value in zip(SCALARS, s.scalars):
+		setattr(game, name, value)
+
+	# The camera, the ground (which is only there before the first landing) and the labels
+	game.world.position = (0, -game.camera_y)
+	if game.jumped and game.ground.parent is not None:
+		game.ground.remove_from_parent()
+	elif not game.jumped and game.ground.parent is None:
+		game.add_child(game.ground)
+	game.score_label.text = str(game.score)
+	game.high_score.text = str(game.high_score_val)
+
+	# The player
+	player = game.player
+	player.remove_all_actions()
+	player.position = (s.player[0], s.player[1])
+	player.x_scale = s.player[2]
+	player.texture = textures.get(game.player_texture)
+	sprites.forget(player)
+	game.render_offset = 0
+	game.clock.reset()
+	game.audio.queue.clear()
+
+	# Blocks
+	blocks = []
+	for x, y in s.blocks:
+		blocks.append(game.spawn(Block, position=(x, y), z_position=-1))
+	game.blocks = blocks
+	grid = game.block_grid
+	_set_cells(grid, s.block_cells, blocks)
+	grid.where = dict((block, key) for key, indices in s.block_cells for block in (blocks[i] for i in indices))
+	if s.current_block >= 0:
+		game.current_block = blocks[s.current_block]
+
+	# Coins, clouds and monsters, with the arrays and grid of their group
+	for (cls, z), g, (arrays, types, scales, cells, half) in zip(((Coin, 0), (Cloud, -2), (Monster, 0)), game.items.groups, s.groups):
+		n = len(arrays[0])
+		while len(g.x) < n:
+			g._grow()
+		for name, a in zip(ITEM_ARRAYS, arrays):
+			getattr(g, name)[:n] = a
+		nodes = []
+		for i, (x, y, enemy_type, (x_scale, y_scale)) in enumerate(zip(arrays[0].tolist(), arrays[1].tolist(), types, scales)):
+			node = game.spawn(cls, position=(x, y), z_position=z)
+			node.x_scale = x_scale
+			node.y_scale = y_scale
+			if enemy_type is not None:
+				node.enemy_type = enemy_type
+				node.destroyed = bool(g.destroyed[i])
+				node.texture = monster_texture(enemy_type, max(0, int(g.frame[i])))
+			nodes.append(node)
+		g.nodes = nodes
+		g.n = n
+		_set_cells(g.grid, cells, nodes)
+		g.half_w, g.half_h = half
+
+	# Monsters that were shot, lasers, and the other timers (in the order they were scheduled)
+	timers.now = s.tick
+	for due, x, y, enemy_type, x_scale, y_scale, z in s.dying:
+		monster = game.spawn(Monster, position=(x, y), z_position=z)
+		monster.enemy_type = enemy_type
+		monster.texture = monster_texture(enemy_type, 2)
+		monster.alpha = 0.5
+		monster.destroyed = True
+		monster.x_scale = x_scale
+		monster.y_scale = y_scale
+		timers.schedule(due - s.tick, game.release, monster)
+	lasers = []
+	for due, x, y in s.lasers:
+		laser = game.spawn(Laser, position=(x, y), z_position=-1)
+		laser.timer = timers.schedule(due - s.tick, game.remove_laser, laser)
+		lasers.append(laser)
+	game.lasers = lasers
+	for due, name, args in s.timers:
+		timers.schedule(due - s.tick, getattr(game, name), *args)
+
+	game.level = s.level.copy() if s.level is not None else None
+	game.level_items = list(s.level_items)
+
+	# Both random number generators last: taking monsters from the pool rolls their type
+	version, state, gauss = s.rng
+	game.rng.setstate((version, tuple(state.tolist()), gauss))
+	game.items.rng.set_state(s.item_rng)
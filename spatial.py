@@ -0,0 +1,101 @@
+# ---[ Broad-phase spatial index
+# A uniform grid over the (vertically scrolling) play field. Every object is filed under the cell that contains its centre, and only moves between buckets when it crosses into a different cell. A collision check then only has to look at the handful of objects filed in the cells around the player hitbox or a laser, no matter how many objects are alive.
+from __future__ import division
+
+import math
+
+import numpy as np
+
+# Cells are numbered row by row. COLUMNS is far more than the screen ever needs; OFFSET keeps objects slightly left of the screen (e.g. clouds spawned at x = -50) in a valid column.
+COLUMNS = 4096
+OFFSET = 2048
+
+
+class SpatialGrid(object):
+	def __init__(self, cell_size=128):
+		self.cell_size = cell_size
+
+		# cell key -> {object: None}. A dict is used instead of a set so that the order in which candidates are returned only depends on the order objects were inserted, which keeps runs reproducible.
+		self.cells = {}
+
+		# object -> cell key, for objects that are tracked without a key array of their own (see insert/update/remove)
+		self.where = {}
+
+	def __len__(self):
+		return len(self.where)
+
+	def key(self, x, y):
+		cs = self.cell_size
+		return int(math.floor(y/cs))*COLUMNS + int(math.floor(x/cs)) + OFFSET
+
+	# Vectorised version of key() for whole arrays of positions
+	def keys(self, x, y):
+		cs = self.cell_size
+		return np.floor(y/cs).astype(np.int64)*COLUMNS + np.floor(x/cs).astype(np.int64) + OFFSET
+
+	# ---[ Key based interface, used by the entity store which keeps the keys in an array of its own
+	def insert_key(self, obj, key):
+		bucket = self.cells.get(key)
+		if bucket is None:
+			bucket = self.cells[key] = {}
+		bucket[obj] = None
+
+	def remove_key(self, obj, key):
+		bucket = self.cells.get(key)
+		if bucket is not None:
+			bucket.pop(obj, None)
+			if not bucket:
+				del self.cells[key]
+
+	def move_key(self, obj, old, new):
+		self.remove_key(obj, old)
+		self.insert_key(obj, new)
+
+	# ---[ Object based interface, for small collections such as the blocks
+	def insert(self, obj, x, y):
+		key = self.key(x, y)
+		self.where[obj] = key
+		self.insert_key(obj, key)
+
+	def remove(self, obj):
+		key = self.where.pop(obj, None)
+		if key is not None:
+			self.remove_key(obj, key)
+
+	# Re-file an object after it moved. Returns True if it changed cells.
+	def update(self, obj, x, y):
+		key = self.key(x, y)
+		old = self.where.get(obj)
+		if old == key:
+			return False
+		if old is not None:
+			self.remove_key(obj, old)
+		self.where[obj] = key
+		self.insert_key(obj, key)
+		return True
+
+	def clear(self):
+		self.cells = {}
+		self.where = {}
+
+	# Return the objects whose centre lies in a cell overlapping the rectangle (x0, y0)-(x1, y1) grown by (margin_x, margin_y). To find everything that can overlap a rectangle, the margins should be half the largest width/height of the objects in the grid.
+	def query(self, x0, y0, x1, y1, margin_x=0, margin_y=0):
+		cs = self.cell_size
+		cells = self.cells
+		cx0 = int(math.floor((x0 - margin_x)/cs)) + OFFSET
+		cx1 = int(math.floor((x1 + margin_x)/cs)) + OFFSET
+		cy0 = int(math.floor((y0 - margin_y)/cs))
+		cy1 = int(math.floor((y1 + margin_y)/cs))
+
+		found = []
+		for cy in range(cy0, cy1 + 1):
+			row = cy*COLUMNS
+			for cx in range(cx0, cx1 + 1):
+				bucket = cells.get(row + cx)
+				if bucket:
+					found.extend(bucket)
+		return found
+
+	# Convenience wrapper for querying with a scene Rect
+	def query_rect(self, rect, margin_x=0, margin_y=0):
+		return self.query(rect.x, rect.y, rect.x + rect.w, rect.y + rect.h, margin_x, margin_y)
@@ -0,0 +1,98 @@
+# ---[ Sprite sync layer
+# Sits between the game state and the sprite nodes. Instead of writing sprite properties directly, the game stages them with set(); flush() then writes, in one pass at the end of the tick, only the properties whose value differs from the one last written to that node. On a device every property write crosses into the renderer, so a monster standing still, a player that keeps facing the same way or a texture that is already shown costs nothing.
+#
+# The layer only knows what it wrote itself: code that changes a node behind its back (the pools resetting a node, destroy_monster...) must call forget(node) before the node is synced again. Game.release does that for every node that goes back to its pool.
+from __future__ import division
+
+import numpy as np
+
+_UNSET = object()
+
+
+class SpriteSync(object):
+	def __init__(self, history=600):
+		# node -> {property: value} staged this tick, and the values last written to each node
+		self.pending = {}
+		self.shown = {}
+
+		# Writes already known to be changes, queued by write()
+		self.queued = []
+
+		# Property values staged and actually written in the current tick, and over all ticks
+		self.requested = 0
+		self.written = 0
+		self.total_requested = 0
+		self.total_written = 0
+		self.ticks = 0
+
+		# Saved writes of the last `history` ticks (a ring buffer)
+		self.saved = np.zeros(history, dtype=np.int64)
+
+	def set(self, node, name, value):
+		props = self.pending.get(node)
+		if props is None:
+			props = self.pending[node] = {}
+		props[name] = value
+		self.requested += 1
+
+	# For code that keeps track of the written values itself (the entity store does that in arrays): queue a write that is known to change the node. Nodes written this way must not be passed to set() as well.
+	def write(self, node, name, value):
+		self.queued.append((node, name, value))
+		self.requested += 1
+
+	# Count `count` values that the caller found unchanged and did not queue
+	def skip(self, count):
+		self.requested += count
+
+	# Write every staged property that changed since it was last written, and everything queued
+	def flush(self):
+		shown = self.shown
+		written = 0
+		for node, props in self.pending.items():
+			last = shown.get(node)
+			if last is None:
+				last = shown[node] = {}
+			for name, value in props.items():
+				old = last.get(name, _UNSET)
+				if old is value or old == value:
+					continue
+				setattr(node, name, value)
+				last[name] = value
+				written += 1
+		self.pending.clear()
+
+		for node, name, value in self.queued:
+			setattr(node, name, value)
+		written += len(self.queued)
+		del self.queued[:]
+
+		self.saved[self.ticks % len(self.saved)] = self.requested - written
+		self.total_requested += self.requested
+		self.total_written += written
+		self.ticks += 1
+		self.written = written
+		self.requested = 0
+
+	# Drop everything known about `node` (its staged and queued values too)
+	def forget(self, node):
+		self.shown.pop(node, None)
+		self.pending.pop(node, None)
+		if self.queued:
+			self.queued = [item for item in self.queued if item[0] is not node]
+
+	def clear(self):
+		self.shown.clear()
+		self.pending.clear()
+		del self.queued[:]
+
+	def stats(self):
+		recorded = min(self.ticks, len(self.saved))
+		return {
+			'ticks': self.ticks,
+			'requested': self.total_requested,
+			'written': self.total_written,
+			'saved': self.total_requested - self.total_written,
+			'saved_per_tick': (self.total_requested - self.total_written)/self.ticks if self.ticks else 0.0,
+			'saved_recent_max': int(self.saved[:recorded].max()) if recorded else 0,
+			'tracked_nodes': len(self.shown),
+		}
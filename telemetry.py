@@ -0,0 +1,393 @@
+# ---[ Gameplay telemetry
+# The game reports what happens in it as typed events: every landing (with the gap from the block the player jumped from), every coin picked up, every monster shot, every death (with its cause) and every game still running when the recording stops, each with the game speed, the score and the tick within the game at that moment. Events are appended to an EventBus, one per game session, which writes them into a preallocated buffer of records (one row assignment, nothing allocated). A full buffer is handed to a TelemetryWriter and swapped for a spare one; the writer's background thread gathers the rows of all its sessions into large chunks and writes each chunk as a compressed .npz file of one array per column, so the game never waits for the disk.
+#
+# The files are read back one at a time: Report adds every chunk to fixed-size histograms (survival over time and height, death rate by speed, landing gaps by speed, and where things happen on the screen), so millions of events are summarised without ever being loaded together.
+#
+#   python farm.py --runs 1000 --telemetry events/
+#   python telemetry.py events/ --save report.npz
+from __future__ import division, print_function
+
+import argparse
+import collections
+import glob
+import os
+import queue
+import random
+import threading
+import time
+
+import numpy as np
+
+# ---[ Events
+LANDING = 1		# x, y: the block landed on; dx, dy: from the block jumped from (the ground is at x = dx = 0, y = 0); value: the points scored
+COIN = 2		# x, y: the coin; value: the points scored
+KILL = 3		# x, y: the monster; value: its type (an index into Game.Monster_types)
+DEATH = 4		# x, y: the player; value: the cause (see CAUSES)
+END = 5			# the game was still running when the recording stopped (the session was closed, or a farm run reached its last tick); x, y: the player
+KINDS = {LANDING: 'landing', COIN: 'coin', KILL: 'kill', DEATH: 'death', END: 'end'}
+
+# Causes of death (Game.death_cause), as stored in DEATH events, by batch_env and by server.py
+CAUSES = {None: 0, 'fell': 1, 'monster': 2}
+CAUSE_NAMES = dict((code, cause) for cause, code in CAUSES.items())
+
+# One event. `game` is the number of the game in its session and `tick` counts from the start of that game; positions are in world coordinates
+EVENT = np.dtype([
+	('session', '<u4'), ('game', '<u4'), ('kind', 'u1'), ('tick', '<u4'), ('speed', '<f4'), ('score', '<i4'),
+	('x', '<f4'), ('y', '<f4'), ('dx', '<f4'), ('dy', '<f4'), ('value', '<f4'),
+])
+
+_STOP = object()
+_FLUSH = object()
+
+
+# ---[ Recording
+class EventBus(object):
+	def __init__(self, writer, session=None, capacity=4096):
+		self.writer = writer
+		self.session = session if session is not None else random.SystemRandom().getrandbits(32)
+		self.capacity = capacity
+		self.buffer = np.zeros(capacity, dtype=EVENT)
+		self.n = 0
+		self.emitted = 0
+
+		# Buffers given back by the writer once their rows are copied (appending to and popping from a deque is thread-safe)
+		self.spare = collections.deque([np.zeros(capacity, dtype=EVENT)])
+
+	def emit(self, game, kind, tick, speed, score, x, y, dx=0.0, dy=0.0, value=0.0):
+		self.buffer[self.n] = (self.session, game, kind, tick, speed, score, x, y, dx, dy, value)
+		self.n += 1
+		self.emitted += 1
+		if self.n == self.capacity:
+			self._hand_over()
+
+	# Give the rows so far to the writer and go on in a spare buffer (a new one only if the writer still holds both)
+	def _hand_over(self):
+		if not self.n:
+			return
+		self.writer.put(self, self.buffer, self.n)
+		self.buffer = self.spare.popleft() if self.spare else np.zeros(self.capacity, dtype=EVENT)
+		self.n = 0
+
+	def recycle(self, buffer):
+		self.spare.append(buffer)
+
+	# Hand over the last events of the session (they are written with the writer's next chunk)
+	def flush(self):
+		self._hand_over()
+
+
+class TelemetryWriter(object):
+	def __init__(self, directory, chunk_events=1 << 16, compress=True, prefix='events'):
+		self.directory = directory
+		self.compress = compress
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+
+		# Chunk files are named after the writer (a random token, so that writers in several processes never clash) and numbered
+		self.name = '%s-%08x' % (prefix, random.SystemRandom().getrandbits(32))
+		self.chunk = np.zeros(chunk_events, dtype=EVENT)
+		self.n = 0
+
+		self.events = 0
+		self.files = 0
+		self.bytes = 0
+		self.write_time = 0.0
+		# The exception that stopped the writer thread, if any
+		self.error = None
+
+		self._queue = queue.Queue()
+		self._thread = threading.Thread(target=self._write_loop, name='TelemetryWriter')
+		self._thread.daemon = True
+		self._thread.start()
+
+	# A new event bus writing to this writer
+	def session(self, session=None, capacity=4096):
+		return EventBus(self, session, capacity)
+
+	# Rows handed over by `bus` (None for rows that came from elsewhere, e.g. an EventLog in another process). Raises the writer's error if it failed
+	def put(self, bus, buffer, n):
+		self._check()
+		self._queue.put((bus, buffer, n))
+
+	def _write_loop(self):
+		try:
+			self._write_items()
+		except Exception as e:
+			# Keep the error for put(), flush() and close() to raise: the rows still queued are lost
+			self.error = e
+
+	def _write_items(self):
+		q = self._queue
+		while True:
+			item = q.get()
+			if item is _STOP or item is _FLUSH:
+				self._write()
+				q.task_done()
+				if item is _STOP:
+					return
+				continue
+			bus, buffer, n = item
+			self._copy(buffer[:n])
+			if bus is not None:
+				bus.recycle(buffer)
+			q.task_done()
+
+	# Copy rows into the chunk, writing it every time it fills up
+	def _copy(self, rows):
+		size = len(self.chunk)
+		while len(rows):
+			k = min(len(rows), size - self.n)
+			self.chunk[self.n:self.n + k] = rows[:k]
+			self.n += k
+			rows = rows[k:]
+			if self.n == size:
+				self._write()
+
+	def _write(self):
+		if not self.n:
+			return
+		start = time.perf_counter()
+		rows = self.chunk[:self.n]
+		path = os.path.join(self.directory, '%s-%06d.npz' % (self.name, self.files))
+		# Written under a temporary name and renamed, so that a reader never sees half a file
+		with open(path + '.tmp', 'wb') as f:
+			(np.savez_compressed if self.compress else np.savez)(f, **dict((name, rows[name]) for name in EVENT.names))
+		os.replace(path + '.tmp', path)
+		self.bytes += os.path.getsize(path)
+		self.events += self.n
+		self.files += 1
+		self.n = 0
+		self.write_time += time.perf_counter() - start
+
+	# Write everything handed over so far (flush the buses first), and wait until it is on disk. Raises the writer's error if it failed (instead of waiting for rows it will never write)
+	def flush(self):
+		self._check()
+		q = self._queue
+		q.put(_FLUSH)
+		with q.all_tasks_done:
+			while q.unfinished_tasks and self._thread.is_alive():
+				q.all_tasks_done.wait(0.1)
+		self._check()
+
+	def close(self):
+		if self._thread.is_alive():
+			self._queue.put(_STOP)
+			self._thread.join()
+		self._check()
+
+	def _check(self):
+		if self.error is not None:
+			raise self.error
+
+	def stats(self):
+		return {'events': self.events, 'files': self.files, 'bytes': self.bytes, 'write_time': self.write_time, 'queued': self._queue.qsize()}
+
+
+# Takes the place of a writer and keeps the events in memory, for sessions played in another process: the rows are sent back with the result and put into the writer of the main process (see farm.py)
+class EventLog(object):
+	def __init__(self):
+		self.parts = []
+
+	def session(self, session=None, capacity=4096):
+		return EventBus(self, session, capacity)
+
+	def put(self, bus, buffer, n):
+		self.parts.append(buffer[:n].copy())
+		bus.recycle(buffer)
+
+	def rows(self):
+		return np.concatenate(self.parts) if self.parts else np.zeros(0, dtype=EVENT)
+
+
+# ---[ Reading
+# The chunk files of a directory, in order, as dicts of column arrays (one file in memory at a time)
+def chunks(directory):
+	for path in sorted(glob.glob(os.path.join(directory, '*.npz'))):
+		with np.load(path) as f:
+			yield dict((name, f[name]) for name in f.files)
+
+
+# Add `counts` (from np.bincount) to the histogram `hist`, which grows if needed
+def _add(hist, counts):
+	if len(counts) > len(hist):
+		hist = np.concatenate([hist, np.zeros((len(counts) - len(hist),) + hist.shape[1:], dtype=hist.dtype)])
+	hist[:len(counts)] += counts
+	return hist
+
+
+class Report(object):
+	# Bin sizes: ticks (one second), world height, screen x (X_BINS of them, the last one takes everything wider), game speed and landing gap
+	TICK_BIN = 60
+	HEIGHT_BIN = 100
+	X_BIN = 25
+	X_BINS = 16
+	SPEED_BIN = 0.1
+	GAP_BIN = 10
+
+	def __init__(self):
+		self.events = 0
+		self.chunks = 0
+		self.kinds = np.zeros(max(KINDS) + 1, dtype=np.int64)
+		self.causes = np.zeros(max(CAUSES.values()) + 1, dtype=np.int64)
+
+		# Deaths by the tick and the height they happened at, and the same for games still running when the recording stopped (the survival curves), deaths and landings by speed (the hazard)
+		self.death_ticks = np.zeros(0, dtype=np.int64)
+		self.death_heights = np.zeros(0, dtype=np.int64)
+		self.end_ticks = np.zeros(0, dtype=np.int64)
+		self.end_heights = np.zeros(0, dtype=np.int64)
+		self.death_speeds = np.zeros(0, dtype=np.int64)
+		self.landing_speeds = np.zeros(0, dtype=np.int64)
+
+		# Landing gaps (rows: speed bins, columns: vertical gap bins) and where each kind of event happens (rows: height bins, columns: x bins)
+		self.gaps = np.zeros((0, 0), dtype=np.int64)
+		self.heat = dict((kind, np.zeros((0, self.X_BINS), dtype=np.int64)) for kind in KINDS)
+
+	def add(self, columns):
+		kind = columns['kind']
+		self.events += len(kind)
+		self.chunks += 1
+		self.kinds = _add(self.kinds, np.bincount(kind))
+
+		speed_bin = np.maximum(columns['speed']/self.SPEED_BIN, 0).astype(np.int64)
+		height_bin = np.maximum(columns['y']//self.HEIGHT_BIN, 0).astype(np.int64)
+		x_bin = np.clip(columns['x']//self.X_BIN, 0, self.X_BINS - 1).astype(np.int64)
+
+		dead = kind == DEATH
+		if dead.any():
+			self.causes = _add(self.causes, np.bincount(columns['value'][dead].astype(np.int64)))
+			self.death_ticks = _add(self.death_ticks, np.bincount(columns['tick'][dead]//self.TICK_BIN))
+			self.death_heights = _add(self.death_heights, np.bincount(height_bin[dead]))
+			self.death_speeds = _add(self.death_speeds, np.bincount(speed_bin[dead]))
+
+		ended = kind == END
+		if ended.any():
+			self.end_ticks = _add(self.end_ticks, np.bincount(columns['tick'][ended]//self.TICK_BIN))
+			self.end_heights = _add(self.end_heights, np.bincount(height_bin[ended]))
+
+		landed = kind == LANDING
+		if landed.any():
+			self.landing_speeds = _add(self.landing_speeds, np.bincount(speed_bin[landed]))
+			gap_bin = np.maximum(columns['dy'][landed]//self.GAP_BIN, 0).astype(np.int64)
+			self._add_2d('gaps', speed_bin[landed], gap_bin)
+
+		for k in KINDS:
+			mask = kind == k
+			if mask.any():
+				self.heat[k] = self._heat(k, height_bin[mask], x_bin[mask])
+
+	def _heat(self, kind, rows, cols):
+		counts = np.bincount(rows*self.X_BINS + cols)
+		counts = np.concatenate([counts, np.zeros(-len(counts) % self.X_BINS, dtype=counts.dtype)]).reshape(-1, self.X_BINS)
+		return _add(self.heat[kind], counts)
+
+	def _add_2d(self, name, rows, cols):
+		hist = getattr(self, name)
+		n_cols = max(hist.shape[1], int(cols.max()) + 1)
+		if n_cols > hist.shape[1]:
+			hist = np.concatenate([hist, np.zeros((hist.shape[0], n_cols - hist.shape[1]), dtype=hist.dtype)], axis=1)
+		counts = np.bincount(rows*n_cols + cols)
+		counts = np.concatenate([counts, np.zeros(-len(counts) % n_cols, dtype=counts.dtype)]).reshape(-1, n_cols)
+		setattr(self, name, _add(hist, counts))
+
+	# Add every chunk file of `directory`
+	def read(self, directory):
+		for columns in chunks(directory):
+			self.add(columns)
+		return self
+
+	# Fraction of the games still running after each TICK_BIN ticks, and after each HEIGHT_BIN points of height (Kaplan-Meier: a game that was still running when the recording stopped counts as running up to that bin, and is left out after it)
+	def survival(self):
+		return _survival(self.death_ticks, self.end_ticks), _survival(self.death_heights, self.end_heights)
+
+	# Deaths per landing in each speed bin
+	def hazard(self):
+		n = max(len(self.death_speeds), len(self.landing_speeds))
+		deaths = np.pad(self.death_speeds, (0, n - len(self.death_speeds))).astype(float)
+		landings = np.pad(self.landing_speeds, (0, n - len(self.landing_speeds))).astype(float)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			return np.where(landings > 0, deaths/np.maximum(landings, 1), np.nan)
+
+	def save(self, path):
+		by_time, by_height = self.survival()
+		arrays = {
+			'kinds': self.kinds, 'causes': self.causes,
+			'survival_ticks': by_time, 'survival_height': by_height, 'hazard': self.hazard(),
+			'death_ticks': self.death_ticks, 'death_heights': self.death_heights, 'end_ticks': self.end_ticks, 'end_heights': self.end_heights,
+			'death_speeds': self.death_speeds, 'landing_speeds': self.landing_speeds, 'gaps': self.gaps,
+			'bins': np.array([self.TICK_BIN, self.HEIGHT_BIN, self.X_BIN, self.SPEED_BIN, self.GAP_BIN]),
+		}
+		for kind, name in KINDS.items():
+			arrays['heat_' + name] = self.heat[kind]
+		np.savez_compressed(path, **arrays)
+
+
+# Survival from the number of deaths and of games cut short in each bin
+def _survival(deaths, ends):
+	n = max(len(deaths), len(ends))
+	if not deaths.sum():
+		return np.ones(n) if n else np.ones(0)
+	deaths = np.pad(deaths, (0, n - len(deaths))).astype(float)
+	ends = np.pad(ends, (0, n - len(ends))).astype(float)
+	# Games at risk in a bin: all the games, less those that died or were cut short in an earlier bin
+	at_risk = deaths.sum() + ends.sum() - np.concatenate([[0], np.cumsum(deaths + ends)[:-1]])
+	return np.cumprod(1 - deaths/np.maximum(at_risk, 1))
+
+
+# A heatmap as text, highest rows first (rows are merged so that at most `rows` are printed)
+def _heatmap(hist, bin_height, rows=20):
+	if not hist.size or not hist.sum():
+		return []
+	merge = max(1, -(-len(hist)//rows))
+	hist = np.concatenate([hist, np.zeros((-len(hist) % merge, hist.shape[1]), dtype=hist.dtype)])
+	hist = hist.reshape(-1, merge, hist.shape[1]).sum(axis=1)
+	shades = ' .:-=+*#%@'
+	top = hist.max()
+	lines = []
+	for i in range(len(hist) - 1, -1, -1):
+		cells = ''.join(shades[int(np.ceil(v/top*(len(shades) - 1)))] for v in hist[i])
+		lines.append('%7d |%s|' % (i*merge*bin_height, cells))
+	return lines
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Summarise gameplay telemetry (chunk files written by TelemetryWriter)')
+	parser.add_argument('directory')
+	parser.add_argument('--save', default=None, help='also save the histograms to this .npz file')
+	args = parser.parse_args(argv)
+
+	start = time.perf_counter()
+	report = Report().read(args.directory)
+	elapsed = time.perf_counter() - start
+	print('%d events in %d chunks, read in %.2f s (%.1fM events/s)' % (report.events, report.chunks, elapsed, report.events/max(elapsed, 1e-9)/1e6))
+	print('  ' + ', '.join('%s %d' % (name, report.kinds[kind] if kind < len(report.kinds) else 0) for kind, name in sorted(KINDS.items())))
+	print('  deaths: ' + ', '.join('%s %d' % (CAUSE_NAMES[code], n) for code, n in enumerate(report.causes) if n))
+
+	by_time, by_height = report.survival()
+	if len(by_time):
+		print('\nsurvival (games still running)')
+		for seconds in (5, 10, 20, 30, 60, 120, 300, 600):
+			i = seconds*60//report.TICK_BIN - 1
+			print('  %4d s  %5.1f%%' % (seconds, 100*by_time[min(i, len(by_time) - 1)]))
+		for height in (500, 1000, 2000, 5000, 10000, 20000):
+			i = height//report.HEIGHT_BIN - 1
+			print('  %5d pt %5.1f%%' % (height, 100*by_height[min(i, len(by_height) - 1)]))
+
+		print('\ndeaths per landing by speed')
+		for i, h in enumerate(report.hazard()):
+			if not np.isnan(h):
+				print('  %4.1f-%4.1f  %.4f  (%d landings)' % (i*report.SPEED_BIN, (i + 1)*report.SPEED_BIN, h, report.landing_speeds[i]))
+
+	for kind in (DEATH, KILL):
+		lines = _heatmap(report.heat[kind], report.HEIGHT_BIN)
+		if lines:
+			print('\n%ss by height and x' % KINDS[kind])
+			print('\n'.join(lines))
+
+	if args.save:
+		report.save(args.save)
+		print('\nsaved to %s' % args.save)
+	return 0
+
+
+if __name__ == '__main__':
+	raise SystemExit(main())
@@ -0,0 +1,80 @@
+# ---[ Texture manager
+# Textures are loaded the first time they are used instead of when the game is imported, and kept in a cache of bounded size keyed by image name. When the cache is full, the texture used least recently is dropped (and loaded again if it is ever needed). Sprites that still show a dropped texture keep it alive, so eviction only limits what the cache itself holds on to.
+#
+# Every load is counted and timed, so stats() shows what loading costs and whether the cache is big enough (a lot of evictions means it is not).
+from __future__ import division
+
+import collections
+import time
+
+from backend import sc
+
+
+class TextureCache(object):
+	def __init__(self, capacity=64, loader=None):
+		self.capacity = capacity
+
+		# Called as loader(name) to create a texture; sc.Texture by default
+		self.loader = loader if loader is not None else sc.Texture
+
+		self._textures = collections.OrderedDict()
+		self.hits = 0
+		self.loads = 0
+		self.evictions = 0
+		self.load_time = 0.0
+
+		# name -> [times loaded, seconds spent loading]
+		self.load_log = {}
+
+	def __len__(self):
+		return len(self._textures)
+
+	def __contains__(self, name):
+		return name in self._textures
+
+	def get(self, name):
+		textures = self._textures
+		texture = textures.get(name)
+		if texture is not None:
+			textures.move_to_end(name)
+			self.hits += 1
+			return texture
+
+		start = time.perf_counter()
+		texture = self.loader(name)
+		elapsed = time.perf_counter() - start
+		self.loads += 1
+		self.load_time += elapsed
+		log = self.load_log.setdefault(name, [0, 0.0])
+		log[0] += 1
+		log[1] += elapsed
+
+		textures[name] = texture
+		if len(textures) > self.capacity:
+			textures.popitem(last=False)
+			self.evictions += 1
+		return texture
+
+	# Load a list of textures ahead of time (e.g. during a loading screen)
+	def preload(self, names):
+		for name in names:
+			self.get(name)
+
+	def clear(self):
+		self._textures.clear()
+
+	def stats(self):
+		slowest = sorted(self.load_log.items(), key=lambda item: -item[1][1])[:5]
+		return {
+			'cached': len(self._textures),
+			'capacity': self.capacity,
+			'hits': self.hits,
+			'loads': self.loads,
+			'evictions': self.evictions,
+			'load_ms': self.load_time*1000,
+			'slowest_ms': [(name, t*1000) for name, (count, t) in slowest],
+		}
+
+
+# The cache shared by everything in the game
+textures = TextureCache()
@@ -0,0 +1,71 @@
+# ---[ Timer wheel
+# Delayed game events (removing a destroyed monster, starting a new game after a death, removing a laser at the end of its flight) are scheduled here in game ticks instead of as sc.Action sequences. The wheel is advanced by the game once per tick, so the events follow the simulation clock: a headless run stepping a hundred times faster than real time fires every event on exactly the same tick as a game played on a device.
+#
+# The wheel is an array of `size` slots; a timer due on tick t waits in slot t % size. Scheduling is O(1) and every tick only looks at its own slot. Cancelling takes the timer out of its slot (a slot only holds a handful of timers), so cancelled timers are not scanned again every turn of the wheel. Timers more than `size` ticks away simply stay in their slot for another turn of the wheel.
+from __future__ import division
+
+
+class Timer(object):
+	__slots__ = ('due', 'callback', 'args', 'active')
+
+	def __init__(self, due, callback, args):
+		self.due = due
+		self.callback = callback
+		self.args = args
+		self.active = True
+
+
+class TimerWheel(object):
+	def __init__(self, size=256):
+		self.size = size
+		self.slots = [[] for i in range(size)]
+
+		# The current tick, and the number of timers that have neither fired nor been cancelled
+		self.now = 0
+		self.pending = 0
+
+	def __len__(self):
+		return self.pending
+
+	# Call callback(*args) at the end of the tick `delay` ticks from now (0: at the end of the current tick). Returns the timer, which can be passed to cancel().
+	def schedule(self, delay, callback, *args):
+		timer = Timer(self.now + max(0, int(delay)), callback, args)
+		self.slots[timer.due % self.size].append(timer)
+		self.pending += 1
+		return timer
+
+	def cancel(self, timer):
+		if timer is not None and timer.active:
+			timer.active = False
+			self.pending -= 1
+			# A timer cancelled by a callback fired in the same advance() has already left its slot
+			try:
+				self.slots[timer.due % self.size].remove(timer)
+			except ValueError:
+				pass
+
+	# Fire the timers due on the current tick and move on to the next one. Timers scheduled with no delay by a callback fire in the same call.
+	def advance(self):
+		now = self.now
+		index = now % self.size
+		slots = self.slots
+		while slots[index]:
+			slot = slots[index]
+			due = [timer for timer in slot if timer.due <= now]
+			if not due:
+				break
+			slots[index] = [timer for timer in slot if timer.due > now]
+			for timer in due:
+				if timer.active:
+					timer.active = False
+					self.pending -= 1
+					timer.callback(*timer.args)
+		self.now = now + 1
+
+	# Drop every timer
+	def clear(self):
+		for slot in self.slots:
+			for timer in slot:
+				timer.active = False
+			del slot[:]
+		self.pending = 0